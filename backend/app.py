@@ -1,119 +1,179 @@
-from datetime import datetime
-from flask import Flask, request
+from flask import Flask, Response, g, jsonify, request
+import logging
+import mimetypes
 import os
-import requests
 import time
+from xml.sax.saxutils import escape
 from dotenv import load_dotenv
 from PIL import ImageFile
-import pandas as pd
-from final import extract_front_fields, extract_back_address
+from assembler import SubmissionAssembler
+from dedupe import DedupeCache
+from media import Media, archive_media, fetch_all, wait_for_archive
+from jobs import OCR_WORKERS, enqueue_job, get_job_status, open_queue, queue_depth, start_worker_pool
+from pdf_ingest import (
+    PDF_CONTENT_TYPE, PasswordRequired, PendingPdfs, WrongPassword, extract_pdf
+)
+from pipeline import finish_result
+import tracing
+
+log = logging.getLogger(__name__)
 
 # Load .env variables
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 
 # Setup
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(message)s")
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 app = Flask(__name__)
 UPLOAD_DIR = "uploads"
-CSV_FILE = "aadhaar_data.csv"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-recent_trigger = {}  # phone_number: timestamp
+dedupe = DedupeCache()
+MESSAGE_DEDUPE_TTL = 3600  # Twilio retries a webhook for well under an hour
+pending_pdfs = PendingPdfs()
+PDF_PASSWORD_PROMPT = (
+    "🔒 Your e-Aadhaar PDF is password protected. Reply with its password: the first 4 letters "
+    "of your name in capitals followed by your year of birth, e.g. SURE1990."
+)
+
+def queue_submission(from_number, media):
+    # Prevent duplicate OCR triggers
+    if dedupe.seen(f"sender:{from_number}"):
+        log.info("⏱ OCR already triggered recently. Skipping duplicate.")
+        return None
+
+    conn = open_queue()
+    try:
+        job_id = enqueue_job(from_number, media, conn=conn)
+    finally:
+        conn.close()
+    log.info(f"📥 Queued OCR job {job_id} for {from_number}")
+    return job_id
+
+def twiml(message):
+    body = f'<?xml version="1.0" encoding="UTF-8"?><Response><Message>{escape(message)}</Message></Response>'
+    return Response(body, mimetype="application/xml")
+
+def ingest_pdf(from_number, media, password=None):
+    try:
+        fields, page = extract_pdf(media.read(), password)
+    except WrongPassword:
+        remaining = pending_pdfs.failed_attempt(from_number)
+        log.info(f"🔒 Wrong PDF password from {from_number}, {remaining} tries left")
+        if remaining:
+            return twiml(f"❌ That password did not open the PDF. {remaining} tries left.")
+        return twiml("❌ That password did not open the PDF. Please send the PDF again, or photos of your card.")
+    except PasswordRequired:
+        pending_pdfs.add(from_number, media)
+        log.info(f"🔒 Asked {from_number} for the PDF password")
+        return twiml(PDF_PASSWORD_PROMPT)
+    except Exception as e:
+        log.error(f"❌ Could not read PDF from {from_number}: {e}")
+        return twiml("⚠️ We could not read that PDF. Please send photos of the front and back of your card.")
+    pending_pdfs.discard(from_number)
+
+    if fields:
+        finish_result(fields, from_number)
+        return twiml("✅ Got your Aadhaar details, thank you.")
+    # No usable text layer: OCR the rendered page on a worker.
+    page_media = Media(os.path.splitext(media.path)[0] + "_page1.png", page)
+    archive_media(page_media)
+    conn = open_queue()
+    try:
+        job_id = enqueue_job(from_number, [page_media], conn=conn, kind="page")
+    finally:
+        conn.close()
+    log.info(f"📥 Queued OCR job {job_id} for the PDF from {from_number}")
+    return twiml("⏳ Got your e-Aadhaar, reading it now.")
+
+assembler = SubmissionAssembler(queue_submission, UPLOAD_DIR)
+
+def get_queue():
+    if "queue" not in g:
+        g.queue = open_queue()
+    return g.queue
+
+@app.teardown_appcontext
+def close_queue(exc):
+    queue = g.pop("queue", None)
+    if queue is not None:
+        queue.close()
 
 @app.route("/whatsapp", methods=["POST"])
 def whatsapp_webhook():
     from_number = request.form.get("From", "").split(":")[-1]
     num_media = int(request.form.get("NumMedia", 0))
+    message_sid = request.form.get("MessageSid")
 
-    print(f"\n📩 Received message from {from_number} with {num_media} media files.")
+    log.info(f"📩 Received message from {from_number} with {num_media} media files.")
+
+    if message_sid and dedupe.seen(f"message:{message_sid}", ttl=MESSAGE_DEDUPE_TTL):
+        log.info(f"🔁 Duplicate delivery of {message_sid}, ignoring.")
+        return "OK", 200
 
     if num_media == 0:
-        print("⚠️ No media found.")
+        pending = pending_pdfs.get(from_number)
+        body = request.form.get("Body", "").strip()
+        if pending is not None and body:
+            # The reply to a password prompt; never log it. The PDF may have
+            # arrived on another process, still writing its archive.
+            try:
+                wait_for_archive(pending.path)
+            except FileNotFoundError as e:
+                log.error(f"❌ Pending PDF from {from_number} is missing: {e}")
+                pending_pdfs.discard(from_number)
+                return twiml("⚠️ We could not find your PDF. Please send it again.")
+            return ingest_pdf(from_number, pending, body)
+        log.warning("⚠️ No media found.")
         return "OK", 200
 
     user_dir = os.path.join(UPLOAD_DIR, from_number)
     os.makedirs(user_dir, exist_ok=True)
 
+    downloads = []
+    is_pdf = []
+    ts = int(time.time() * 1000)
     for i in range(num_media):
         media_url = request.form.get(f"MediaUrl{i}")
-        content_type = request.form.get(f"MediaContentType{i}")
-        ext = content_type.split("/")[-1]
-        ts = int(time.time() * 1000)
-        file_path = os.path.join(user_dir, f"image_{ts}.{ext}")
-
-        response = requests.get(media_url, auth=(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN")))
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-        print(f"✅ Saved {file_path}")
-
-    # Wait for disk I/O flush
-    time.sleep(1.5)
-
-    image_paths = sorted(
-        [os.path.join(user_dir, f) for f in os.listdir(user_dir) if f.startswith("image_")],
-        key=os.path.getmtime,
-        reverse=True
-    )
-
-    if len(image_paths) < 2:
-        print(f"⏳ Waiting for 2 images... Found: {len(image_paths)}")
-        return "OK", 200
-
-    # Prevent duplicate OCR triggers
-    now = time.time()
-    if from_number in recent_trigger and now - recent_trigger[from_number] < 20:
-        print("⏱ OCR already triggered recently. Skipping duplicate.")
-        return "OK", 200
-    recent_trigger[from_number] = now
-
-    img1, img2 = image_paths[:2]
-
-    print("🔍 Detecting which image is FRONT using gender detection...")
-    fields1 = extract_front_fields(img1)
-    fields2 = extract_front_fields(img2)
-
-    if 'gender' in fields1:
-        front_img, back_img, front_fields = img1, img2, fields1
-    elif 'gender' in fields2:
-        front_img, back_img, front_fields = img2, img1, fields2
-    else:
-        print("❌ Could not identify front image.")
-        return "OK", 200
-
-    print(f"✅ Identified {os.path.basename(front_img)} as FRONT")
-    print(f"📦 Processing address from {os.path.basename(back_img)}")
-
-    try:
-        address, pincode = extract_back_address(back_img)
-    except Exception as e:
-        print(f"❌ Address extraction error: {e}")
-        address, pincode = None, None
-
-    result = front_fields
-    result['address'] = address
-    result['pincode'] = pincode
-    result['timestamp'] = datetime.now().isoformat()
-    result['phone_number'] = from_number
-
-    print("\n======= FINAL EXTRACTED DATA =======")
-    for k, v in result.items():
-        print(f"{k}: {v}")
- # Save to CSV
-    try:
-        if not os.path.exists(CSV_FILE):
-            pd.DataFrame(columns=[
-                "timestamp", "phone_number", "name", "dob", "gender",
-                "aadhaar_number", "address", "pincode"
-            ]).to_csv(CSV_FILE, index=False)
-
-        df = pd.read_csv(CSV_FILE)
-        df = pd.concat([df, pd.DataFrame([result])], ignore_index=True)
-        df.to_csv(CSV_FILE, index=False)
-        print(f"📁 Data saved to {CSV_FILE}")
-    except Exception as e:
-        print(f"❌ Failed to save to CSV: {e}")
-
-    return "OK", 200
+        content_type = request.form.get(f"MediaContentType{i}", "").split(";")[0].strip().lower()
+        ext = mimetypes.guess_extension(content_type) or "." + content_type.split("/")[-1]
+        # PDFs are not named image_* so the assembler never pairs them with photos.
+        prefix = "document" if content_type == PDF_CONTENT_TYPE else "image"
+        downloads.append((media_url, os.path.join(user_dir, f"{prefix}_{ts + i}{ext}")))
+        is_pdf.append(content_type == PDF_CONTENT_TYPE)
+
+    auth = (os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+    fetched = fetch_all(downloads, auth)
+    reply = None
+    for item, pdf in zip(fetched, is_pdf):
+        if item and pdf:
+            reply = ingest_pdf(from_number, item)
+    media = [item for item, pdf in zip(fetched, is_pdf) if item and not pdf]
+    if media:
+        assembler.add(from_number, media)
+    return reply or ("OK", 200)
+
+@app.route("/jobs/<int:job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_job_status(job_id, conn=get_queue())
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(job), 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    histograms, counters = tracing.gather()
+    depth = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    depth.update(queue_depth(get_queue()))
+    gauges = [("ocr_jobs", "Jobs in the queue by status", {"status": status}, n) for status, n in depth.items()]
+    hits = sum(v for (name, _), v in counters.items() if name == 'ocr_result_cache_hits_total')
+    misses = sum(v for (name, _), v in counters.items() if name == 'ocr_result_cache_misses_total')
+    if hits + misses:
+        gauges.append(("ocr_result_cache_hit_ratio", "Share of result cache lookups that hit", {}, hits / (hits + misses)))
+    body = tracing.render_prometheus(histograms, counters, gauges)
+    return Response(body, mimetype="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    start_worker_pool(OCR_WORKERS)
+    # The reloader would fork a second copy of the worker pool.
+    app.run(debug=True, use_reloader=False)
@@ -0,0 +1,168 @@
+import logging
+import os
+import re
+import threading
+import time
+from db import LocalConnection
+from media import Media
+
+log = logging.getLogger(__name__)
+
+# ====== CONFIG ======
+SUBMISSION_IDLE_TIMEOUT = float(os.getenv("SUBMISSION_IDLE_TIMEOUT", 30))
+SENDER_HISTORY = int(os.getenv("SENDER_HISTORY", 10))
+SENDER_TTL = float(os.getenv("SENDER_TTL", 24 * 3600))
+# Shared by every app process: a sender's front and back may reach different gunicorn workers.
+SENDERS_DB = os.getenv("SENDERS_DB", "senders.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    sender TEXT NOT NULL,
+    path TEXT NOT NULL,
+    ts REAL NOT NULL,
+    pending INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sender, path)
+);
+CREATE INDEX IF NOT EXISTS idx_uploads_sender ON uploads (sender, pending, ts);
+CREATE INDEX IF NOT EXISTS idx_uploads_ts ON uploads (ts);
+"""
+
+
+def image_timestamp(path):
+    # Uploads are named image_<epoch ms>.<ext>; the name orders them without a stat call.
+    m = re.match(r'image_(\d+)', os.path.basename(path))
+    return int(m.group(1)) / 1000 if m else 0.0
+
+
+class UploadLog:
+    """
+    Each sender's recent uploads, and which of them still wait for a partner.
+    A sender with no rows (new, or pruned after `ttl`) is reloaded from their
+    upload directory on demand.
+    """
+    def __init__(self, upload_dir, path=SENDERS_DB, ttl=SENDER_TTL):
+        self.upload_dir = upload_dir
+        self.ttl = ttl
+        self._db = LocalConnection(path, SCHEMA)
+        self._writes = 0
+
+    def load_from_disk(self, conn, sender):
+        if conn.execute("SELECT 1 FROM uploads WHERE sender = ? LIMIT 1", (sender,)).fetchone():
+            return
+        user_dir = os.path.join(self.upload_dir, sender)
+        if not os.path.isdir(user_dir):
+            return
+        names = [f for f in os.listdir(user_dir) if f.startswith("image_")]
+        paths = sorted((os.path.join(user_dir, f) for f in names), key=image_timestamp)[-SENDER_HISTORY:]
+        conn.executemany(
+            "INSERT OR IGNORE INTO uploads (sender, path, ts) VALUES (?, ?, ?)",
+            [(sender, path, image_timestamp(path)) for path in paths]
+        )
+
+    def add_pending(self, conn, sender, media):
+        now = time.time()
+        self.load_from_disk(conn, sender)
+        conn.executemany(
+            "INSERT OR REPLACE INTO uploads (sender, path, ts, pending) VALUES (?, ?, ?, 1)",
+            [(sender, item.path, image_timestamp(item.path) or now) for item in media]
+        )
+
+    def pending(self, conn, sender):
+        rows = conn.execute(
+            "SELECT path FROM uploads WHERE sender = ? AND pending = 1 ORDER BY ts, path", (sender,)
+        )
+        return [row["path"] for row in rows]
+
+    def latest_previous(self, conn, sender):
+        row = conn.execute(
+            "SELECT path FROM uploads WHERE sender = ? AND pending = 0 ORDER BY ts DESC, path DESC LIMIT 1",
+            (sender,)
+        ).fetchone()
+        return row["path"] if row else None
+
+    def release(self, conn, sender):
+        conn.execute("UPDATE uploads SET pending = 0 WHERE sender = ? AND pending = 1", (sender,))
+        conn.execute(
+            "DELETE FROM uploads WHERE sender = ? AND pending = 0 AND path NOT IN ("
+            "SELECT path FROM uploads WHERE sender = ? ORDER BY ts DESC LIMIT ?)",
+            (sender, sender, SENDER_HISTORY)
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            conn.execute("DELETE FROM uploads WHERE ts < ?", (time.time() - self.ttl,))
+
+    def transaction(self):
+        conn = self._db.get()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+
+class SubmissionAssembler:
+    """
+    Collect media per sender as webhook calls arrive. A pair of Media is handed
+    to `on_ready(sender, media)` the moment two images are pending; a lone
+    image is paired with the sender's previous upload once they have been idle
+    for `idle_timeout` seconds. Pending images live in SQLite, so any app
+    process may complete a pair another one started.
+    """
+    def __init__(self, on_ready, upload_dir, idle_timeout=SUBMISSION_IDLE_TIMEOUT, db_path=SENDERS_DB):
+        self.on_ready = on_ready
+        self.idle_timeout = idle_timeout
+        self.uploads = UploadLog(upload_dir, db_path)
+        self._timers = {}  # sender: idle Timer started by this process
+        self._lock = threading.Lock()
+
+    def add(self, sender, media):
+        conn = self.uploads.transaction()
+        try:
+            self.uploads.add_pending(conn, sender, media)
+            pending = self.uploads.pending(conn, sender)
+            ready = dropped = None
+            if len(pending) >= 2:
+                # The two newest images make the pair; anything older was superseded.
+                ready, dropped = pending[::-1][:2], pending[:-2]
+                self.uploads.release(conn, sender)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            timer = self._timers.pop(sender, None)
+            if timer:
+                timer.cancel()
+            if not ready:
+                timer = self._timers[sender] = threading.Timer(
+                    self.idle_timeout, self._expire, args=(sender, pending[-1])
+                )
+                timer.daemon = True
+                timer.start()
+        if dropped:
+            log.warning(f"⚠️ {sender} has {len(pending)} images pending, ignoring the older "
+                        f"{', '.join(os.path.basename(path) for path in dropped)}")
+        if ready:
+            return self.on_ready(sender, [Media(path) for path in ready])
+        log.info(f"⏳ Waiting for 2 images from {sender}... Found: {len(pending)}")
+        return None
+
+    def _expire(self, sender, newest):
+        with self._lock:
+            if self._timers.get(sender) is threading.current_thread():
+                del self._timers[sender]
+        conn = self.uploads.transaction()
+        try:
+            pending = self.uploads.pending(conn, sender)
+            # Another process may have paired the image, or be timing a newer one.
+            previous = None
+            if pending and pending[-1] == newest:
+                previous = self.uploads.latest_previous(conn, sender)
+            if previous:
+                self.uploads.release(conn, sender)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if not previous:
+            # Keep the image pending; the sender's next upload completes the pair.
+            return
+        log.info(f"⌛ {sender} went idle, pairing with previous upload {os.path.basename(previous)}")
+        self.on_ready(sender, [Media(newest), Media(previous)])
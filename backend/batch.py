@@ -0,0 +1,210 @@
+"""
+Re-run extraction over an archive of uploads, e.g. after a pipeline change.
+
+Pairs come from a manifest CSV (front_path, back_path, optional phone_number)
+or from walking a directory: image_<ms> uploads in the same folder are ordered
+by that timestamp and consecutive uploads within --window seconds of each
+other are treated as one submission. Front/back is decided by the pipeline,
+so the pair order does not matter.
+
+Results stream to --out as they finish (.jsonl, .csv or .db/.sqlite). Every
+finished pair is appended to the checkpoint file, so an interrupted run picks
+up where it stopped when started again with the same arguments. The
+service's result cache is neither read nor filled unless --use-cache is given.
+
+    python batch.py uploads/ --out results.jsonl --workers 8
+    python batch.py manifest.csv --out results.db
+"""
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import time
+from assembler import SUBMISSION_IDLE_TIMEOUT, image_timestamp
+from store import COLUMNS, insert_record, open_store
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff'}
+OUTPUT_COLUMNS = COLUMNS + ['images']
+
+
+# ====== INPUT ======
+def read_manifest(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [
+            (row.get('phone_number') or None, [row['front_path'], row['back_path']])
+            for row in csv.DictReader(f)
+        ]
+
+
+def walk_pairs(root, window=SUBMISSION_IDLE_TIMEOUT):
+    pairs = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        # Only card photos; rendered PDF pages (document_*) are single submissions.
+        images = [
+            os.path.join(dirpath, name) for name in filenames
+            if name.startswith("image_") and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+        ]
+        images.sort(key=lambda path: (image_timestamp(path), path))
+        i = 0
+        while i + 1 < len(images):
+            first, second = images[i], images[i + 1]
+            ts1, ts2 = image_timestamp(first), image_timestamp(second)
+            # Untimestamped files (both 0) are paired in name order.
+            if ts2 - ts1 <= window:
+                pairs.append((None, [first, second]))
+                i += 2
+            else:
+                print(f"⚠️ No partner for {first}, skipping")
+                i += 1
+        if i < len(images):
+            print(f"⚠️ No partner for {images[i]}, skipping")
+    return pairs
+
+
+def pair_key(images):
+    return '|'.join(images)
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+# ====== OUTPUT ======
+class JsonlWriter:
+    def __init__(self, path):
+        self.f = open(path, 'a', encoding='utf-8')
+
+    def write(self, result):
+        self.f.write(json.dumps(result) + '\n')
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class CsvWriter:
+    def __init__(self, path):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.f = open(path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.f, fieldnames=OUTPUT_COLUMNS, extrasaction='ignore', lineterminator="\n")
+        if new:
+            self.writer.writeheader()
+
+    def write(self, result):
+        self.writer.writerow({**result, 'images': ';'.join(result['images'])})
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class SQLiteWriter:
+    def __init__(self, path):
+        self.conn = open_store(path)
+
+    def write(self, result):
+        insert_record(result, self.conn)
+
+    def close(self):
+        self.conn.close()
+
+
+def open_writer(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.jsonl':
+        return JsonlWriter(path)
+    if ext == '.csv':
+        return CsvWriter(path)
+    if ext in ('.db', '.sqlite', '.sqlite3'):
+        return SQLiteWriter(path)
+    raise ValueError(f"Unsupported output format: {path} (use .jsonl, .csv or .db)")
+
+
+# ====== WORKERS ======
+_use_cache = False
+
+
+def init_worker(verbose, use_cache=False):
+    global _use_cache
+    # Pipeline progress is logged at INFO; keep only warnings unless asked.
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING, format="%(message)s", force=True)
+    _use_cache = use_cache
+
+
+def process_pair(item):
+    # Imported here so the parent process never loads OpenCV/Tesseract state it would fork.
+    from media import Media
+    from pipeline import process_submission
+
+    phone_number, images = item
+    try:
+        result = process_submission(
+            phone_number, [Media(path) for path in images], save=False, use_cache=_use_cache
+        )
+    except Exception as e:
+        return images, None, f"{type(e).__name__}: {e}"
+    if result is None:
+        return images, None, "could not identify the front image"
+    result['images'] = images
+    return images, result, None
+
+
+def run_batch(items, out_path, checkpoint_path, workers, verbose=False, use_cache=False):
+    done = load_checkpoint(checkpoint_path)
+    todo = [item for item in items if pair_key(item[1]) not in done]
+    print(f"📦 {len(items)} pairs, {len(items) - len(todo)} already done, {len(todo)} to process on {workers} workers")
+    if not todo:
+        return 0, 0
+
+    # One Tesseract thread per process; parallelism comes from the pool.
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    writer = open_writer(out_path)
+    ok = failed = 0
+    start = time.perf_counter()
+    try:
+        with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+                multiprocessing.Pool(workers, initializer=init_worker, initargs=(verbose, use_cache)) as pool:
+            for n, (images, result, error) in enumerate(pool.imap_unordered(process_pair, todo), 1):
+                if error:
+                    failed += 1
+                    print(f"❌ {', '.join(images)}: {error}")
+                else:
+                    writer.write(result)
+                    checkpoint.write(pair_key(images) + '\n')
+                    checkpoint.flush()
+                    ok += 1
+                elapsed = time.perf_counter() - start
+                rate = n / elapsed
+                print(f"⏳ {n}/{len(todo)} ({rate:.2f} pairs/s, ETA {(len(todo) - n) / rate:.0f}s)")
+    finally:
+        writer.close()
+    print(f"✅ {ok} done, {failed} failed in {time.perf_counter() - start:.1f}s")
+    return ok, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory of uploads or a manifest CSV")
+    parser.add_argument("--out", required=True, help="results file: .jsonl, .csv or .db")
+    parser.add_argument("--checkpoint", help="defaults to <out>.done")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--window", type=float, default=SUBMISSION_IDLE_TIMEOUT,
+                        help="max seconds between two uploads of one submission")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline output from the workers")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="reuse and fill the service's result cache (off: every pair is extracted afresh)")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        items = walk_pairs(args.source, args.window)
+    else:
+        items = read_manifest(args.source)
+    run_batch(
+        items, args.out, args.checkpoint or args.out + ".done", args.workers, args.verbose, args.use_cache
+    )
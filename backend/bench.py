@@ -0,0 +1,296 @@
+"""
+Headless throughput/accuracy benchmark on synthetic Aadhaar-like cards.
+
+Generates front/back card pairs with known field values, distorts them like
+phone photos (perspective, rotation, blur, noise, JPEG), runs the final.py
+pipeline on each and reports per-stage p50/p95 latency, cards/sec,
+per-field accuracy and how often each front template zone alone reads its
+field as JSON. Same --seed, same cards, so two runs on
+different commits are directly comparable.
+
+    python bench.py --cards 50 --out bench.json
+    python bench.py --cards 50 --baseline bench.json      # print the deltas
+    python bench.py --cards 20 --save cards/              # also write JPEGs + manifest.csv
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import subprocess
+import time
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+import final
+import tracing
+from bench_resolution import FIELDS, normalize, percentile
+
+BENCH_FIELDS = FIELDS + ['address']
+# Bump whenever the same --seed would yield different cards; reports carry it.
+# 2: Aadhaar numbers end in their Verhoeff check digit.
+BENCH_GENERATOR = 2
+CARD_SIZE = (1012, 638)  # ID-1 at 300 dpi
+FONT_DIRS = ["/usr/share/fonts/truetype/dejavu", "/Library/Fonts", "C:\\Windows\\Fonts"]
+FONT_NAMES = ["DejaVuSans.ttf", "DejaVuSans-Bold.ttf", "Arial.ttf", "arial.ttf"]
+
+FIRST_NAMES = ["Rahul", "Priya", "Amit", "Sneha", "Vikram", "Anjali", "Suresh", "Kavya", "Arjun", "Meera"]
+LAST_NAMES = ["Sharma", "Patil", "Reddy", "Nair", "Gupta", "Kulkarni", "Iyer", "Singh", "Joshi", "Desai"]
+STREETS = ["MG Road", "Station Road", "Gandhi Nagar", "Nehru Street", "Temple Street", "Market Road"]
+LOCALITIES = ["Indiranagar", "Kothrud", "Banjara Hills", "Adyar", "Salt Lake", "Malviya Nagar"]
+CITIES = [("Bengaluru", "Karnataka"), ("Pune", "Maharashtra"), ("Hyderabad", "Telangana"),
+          ("Chennai", "Tamil Nadu"), ("Kolkata", "West Bengal"), ("Jaipur", "Rajasthan")]
+
+
+# ====== SYNTHETIC CARDS ======
+def load_font(size, bold=False):
+    names = FONT_NAMES[1::-1] if bold else FONT_NAMES
+    for directory in FONT_DIRS:
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                return ImageFont.truetype(path, size)
+    return ImageFont.load_default(size)
+
+
+def random_truth(rng):
+    city, state = rng.choice(CITIES)
+    pincode = f"{rng.randint(1, 8)}{rng.randint(0, 99999):05d}"
+    digits = f"{rng.randint(2, 9)}{rng.randint(0, 10 ** 11 - 1):011d}"
+    # Same draws as generator 1; only the last digit becomes the Verhoeff check digit.
+    digits = digits[:11] + final.verhoeff_check_digit(digits[:11])
+    lines = [
+        f"S/O {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)},",
+        f"{rng.randint(1, 250)}, {rng.choice(STREETS)},",
+        f"{rng.choice(LOCALITIES)}, {city},",
+    ]
+    return {
+        'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        'dob': f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1950, 2005)}",
+        'gender': rng.choice(["Male", "Female"]),
+        'aadhaar_number': ' '.join(digits[i:i + 4] for i in range(0, 12, 4)),
+        'address': ' '.join(lines),
+        'address_lines': lines + [f"{state} - {pincode}"],
+        'pincode': pincode,
+    }
+
+
+def render_front(truth):
+    w, h = CARD_SIZE
+    card = Image.new("RGB", CARD_SIZE, "white")
+    draw = ImageDraw.Draw(card)
+    draw.rectangle([0, 0, w, 90], fill=(255, 153, 51))
+    draw.text((w // 2, 45), "Government of India", font=load_font(40, bold=True), fill="black", anchor="mm")
+    draw.rectangle([40, 130, 250, 390], fill=(200, 200, 200))
+    body = load_font(34)
+    draw.text((290, 150), truth['name'], font=body, fill="black")
+    draw.text((290, 215), f"DOB: {truth['dob']}", font=body, fill="black")
+    draw.text((290, 280), truth['gender'], font=body, fill="black")
+    draw.text((w // 2, 500), truth['aadhaar_number'], font=load_font(52, bold=True), fill="black", anchor="mm")
+    draw.line([40, 570, w - 40, 570], fill=(220, 30, 30), width=4)
+    return card
+
+
+def render_back(truth, rng):
+    w, h = CARD_SIZE
+    card = Image.new("RGB", CARD_SIZE, "white")
+    draw = ImageDraw.Draw(card)
+    # QR-like block pattern on the left half, address on the right.
+    cell = 12
+    for y in range(150, 150 + 25 * cell, cell):
+        for x in range(60, 60 + 25 * cell, cell):
+            if rng.random() < 0.5:
+                draw.rectangle([x, y, x + cell - 1, y + cell - 1], fill="black")
+    body = load_font(26)
+    draw.text((w // 2 + 10, 110), "Address:", font=load_font(28, bold=True), fill="black")
+    for i, line in enumerate(truth['address_lines']):
+        draw.text((w // 2 + 10, 160 + i * 44), line, font=body, fill="black")
+    return card
+
+
+def photograph(card, rng, coarse_rotation=False):
+    """
+    Lay the card on a background and distort it like a phone photo.
+    """
+    image = cv2.cvtColor(np.asarray(card), cv2.COLOR_RGB2BGR)
+    h, w = image.shape[:2]
+    canvas_w, canvas_h = int(w * 1.5), int(h * 1.7)
+    background = np.full((canvas_h, canvas_w, 3), [rng.randint(30, 110) for _ in range(3)], np.uint8)
+    noise = np.random.default_rng(rng.randint(0, 2 ** 32 - 1))
+    background = cv2.add(background, noise.integers(0, 25, background.shape, dtype=np.uint8))
+
+    jitter = 0.06
+    x0, y0 = (canvas_w - w) / 2, (canvas_h - h) / 2
+    corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    target = np.float32([
+        [x0 + dx * jitter * w, y0 + dy * jitter * h]
+        for dx, dy in ((rng.uniform(-1, 1), rng.uniform(-1, 1)) for _ in range(4))
+    ]) + np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    M = cv2.getPerspectiveTransform(corners, target)
+    warped = cv2.warpPerspective(image, M, (canvas_w, canvas_h))
+    mask = cv2.warpPerspective(np.full((h, w), 255, np.uint8), M, (canvas_w, canvas_h))
+    photo = np.where(mask[..., None] > 0, warped, background)
+
+    angle = rng.uniform(-3, 3)
+    R = cv2.getRotationMatrix2D((canvas_w / 2, canvas_h / 2), angle, 1.0)
+    photo = cv2.warpAffine(photo, R, (canvas_w, canvas_h), borderMode=cv2.BORDER_REPLICATE)
+    if coarse_rotation:
+        photo = final.rotate_image(photo, rng.choice([0, 90, 180, 270]))
+
+    sigma = rng.uniform(0, 1.2)
+    if sigma > 0.3:
+        photo = cv2.GaussianBlur(photo, (0, 0), sigma)
+    photo = np.clip(photo + noise.normal(0, rng.uniform(0, 8), photo.shape), 0, 255).astype(np.uint8)
+    ok, jpeg = cv2.imencode(".jpg", photo, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return jpeg.tobytes()
+
+
+def generate_cards(count, seed=0):
+    rng = random.Random(seed)
+    cards = []
+    for _ in range(count):
+        truth = random_truth(rng)
+        cards.append({
+            'truth': truth,
+            'front': photograph(render_front(truth), rng),
+            'back': photograph(render_back(truth, rng), rng, coarse_rotation=True),
+        })
+    return cards
+
+
+def save_cards(cards, directory):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "manifest.csv"), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['front_path', 'back_path'] + BENCH_FIELDS, lineterminator="\n")
+        writer.writeheader()
+        for i, card in enumerate(cards):
+            row = {k: card['truth'][k] for k in BENCH_FIELDS}
+            for side in ('front', 'back'):
+                path = os.path.join(directory, f"card_{i:04d}_{side}.jpg")
+                with open(path, 'wb') as img:
+                    img.write(card[side])
+                row[f"{side}_path"] = path
+            writer.writerow(row)
+    print(f"📁 Saved {len(cards)} cards to {directory}")
+
+
+# ====== RUN ======
+def run_card(card):
+    fields = final.extract_front_fields(card['front'])
+    fields['address'], fields['pincode'] = final.extract_back_address(card['back'])
+    return fields
+
+
+def summarize(values):
+    return {
+        'p50': percentile(values, 0.5),
+        'p95': percentile(values, 0.95),
+        'mean': sum(values) / len(values) if values else None,
+    }
+
+
+def run_bench(cards):
+    latencies = []
+    stages = {}
+    correct = {f: 0 for f in BENCH_FIELDS}
+    zone_hits = {f: 0 for f in final.FRONT_ZONES}
+    canonical = 0
+    errors = 0
+    start = time.perf_counter()
+    for card in cards:
+        with tracing.collect() as timings:
+            card_start = time.perf_counter()
+            try:
+                fields = run_card(card)
+            except Exception as e:
+                errors += 1
+                fields = {}
+                print(f"❌ Card failed: {e}")
+            latencies.append(time.perf_counter() - card_start)
+        for name, seconds in timings.items():
+            stages.setdefault(name, []).append(seconds)
+        for f in BENCH_FIELDS:
+            correct[f] += normalize(fields.get(f)) == normalize(card['truth'][f])
+        # Outside the timings: checks FRONT_ZONES against where the fields really are.
+        front = final.load_front_image(card['front'])
+        if front.canonical:
+            canonical += 1
+            for f in final.FRONT_ZONES:
+                value, _ = final.read_front_zone(front, f)
+                zone_hits[f] += normalize(value) == normalize(card['truth'][f])
+    elapsed = time.perf_counter() - start
+
+    return {
+        'cards': len(cards),
+        'errors': errors,
+        'cards_per_sec': len(cards) / elapsed if elapsed else None,
+        'latency': summarize(latencies),
+        # Per card, summed over every call of the stage; 'cards' is how many cards ran it.
+        'stages': {name: {**summarize(v), 'cards': len(v)} for name, v in sorted(stages.items())},
+        'accuracy': {f: correct[f] / len(cards) for f in BENCH_FIELDS} if cards else {},
+        # Share of the canonical fronts whose zone read alone got the field right.
+        'canonical_fronts': canonical,
+        'zone_hits': {f: zone_hits[f] / canonical for f in final.FRONT_ZONES} if canonical else {},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline):
+    def delta(new, old):
+        return f"{old:.3f} → {new:.3f}" if new is not None and old is not None else f"{old} → {new}"
+
+    print(f"\n📊 {baseline.get('commit')} → {report.get('commit')}")
+    if baseline.get('generator', 1) != report.get('generator', 1):
+        print(f"⚠️ Baseline cards come from generator {baseline.get('generator', 1)}, these from "
+              f"{report.get('generator', 1)}: same seed, different cards, so accuracy is not comparable")
+    print(f"cards/sec: {delta(report['cards_per_sec'], baseline['cards_per_sec'])}")
+    for q in ('p50', 'p95'):
+        print(f"latency {q}: {delta(report['latency'][q], baseline['latency'][q])}")
+    for name, stats in report['stages'].items():
+        old = baseline['stages'].get(name, {})
+        print(f"  {name} p50: {delta(stats['p50'], old.get('p50'))}")
+    for f, acc in report['accuracy'].items():
+        print(f"accuracy {f}: {delta(acc, baseline['accuracy'].get(f))}")
+    for f, rate in report.get('zone_hits', {}).items():
+        print(f"zone {f}: {delta(rate, baseline.get('zone_hits', {}).get(f))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--save", help="also write the generated cards and a manifest.csv to this directory")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline output")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+
+    print(f"🧪 Generating {args.cards} synthetic cards (seed {args.seed})...")
+    cards = generate_cards(args.cards, args.seed)
+    if args.save:
+        save_cards(cards, args.save)
+    report = {
+        'commit': git_commit(),
+        'fingerprint': final.pipeline_fingerprint(),
+        'seed': args.seed,
+        'generator': BENCH_GENERATOR,
+        **run_bench(cards),
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+        print(f"📁 Report written to {args.out}")
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
@@ -0,0 +1,77 @@
+"""
+Sweep the OCR working resolution over a labelled set of cards and report the
+latency/accuracy curve as JSON.
+
+The manifest is a CSV with front_path and optional back_path columns plus the
+expected name, dob, gender, aadhaar_number and pincode.
+
+    python bench_resolution.py manifest.csv --dpi 150 200 250 300 400 --out curve.json
+"""
+import argparse
+import csv
+import json
+import time
+import final
+
+FIELDS = ['name', 'dob', 'gender', 'aadhaar_number', 'pincode']
+
+
+def normalize(value):
+    return ' '.join(str(value or '').lower().split())
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def run_card(row):
+    fields = final.extract_front_fields(row['front_path'])
+    if row.get('back_path'):
+        _, fields['pincode'] = final.extract_back_address(row['back_path'])
+    return fields
+
+
+def run_sweep(rows, dpis):
+    curve = []
+    for dpi in dpis:
+        final.TARGET_DPI = dpi
+        latencies = []
+        correct = {f: 0 for f in FIELDS}
+        totals = {f: 0 for f in FIELDS}
+        for row in rows:
+            start = time.perf_counter()
+            fields = run_card(row)
+            latencies.append(time.perf_counter() - start)
+            for f in FIELDS:
+                if row.get(f):
+                    totals[f] += 1
+                    correct[f] += normalize(fields.get(f)) == normalize(row[f])
+        curve.append({
+            'dpi': dpi,
+            'cards': len(rows),
+            'latency_p50': percentile(latencies, 0.5),
+            'latency_p95': percentile(latencies, 0.95),
+            'accuracy': {f: correct[f] / totals[f] for f in FIELDS if totals[f]},
+        })
+        print(f"📊 {dpi} dpi: p50 {curve[-1]['latency_p50']:.2f}s, accuracy {curve[-1]['accuracy']}")
+    return curve
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest")
+    parser.add_argument("--dpi", type=int, nargs="+", default=[150, 200, 250, 300, 400])
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    with open(args.manifest, newline='') as f:
+        rows = list(csv.DictReader(f))
+    report = json.dumps({'curve': run_sweep(rows, args.dpi)}, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
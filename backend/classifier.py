@@ -0,0 +1,84 @@
+import io
+import os
+import cv2
+import numpy as np
+from PIL import Image
+from final import to_gray
+from ocr_engine import get_engine
+
+# ====== CONFIG ======
+CLASSIFY_WIDTH = 640
+OCR_STRIP_WIDTH = 1000
+HAARCASCADES_DIR = cv2.data.haarcascades if hasattr(cv2, "data") else ""
+FACE_CASCADE_PATH = os.getenv("FACE_CASCADE", os.path.join(HAARCASCADES_DIR, "haarcascade_frontalface_default.xml"))
+FRONT_KEYWORDS = ('female', 'male', 'dob', 'birth', 'year of')
+BACK_KEYWORDS = ('address', 's/o', 'w/o', 'c/o', 'd/o', 'pin')
+
+_face_cascade = None
+
+
+def get_face_cascade():
+    global _face_cascade
+    if _face_cascade is None:
+        cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH) if os.path.exists(FACE_CASCADE_PATH) else None
+        _face_cascade = cascade if cascade is not None and not cascade.empty() else False
+    return _face_cascade
+
+
+def load_small_gray(source, width):
+    if isinstance(source, np.ndarray):
+        gray = to_gray(source)
+    else:
+        image = Image.open(source if isinstance(source, str) else io.BytesIO(source))
+        # JPEG draft mode lets libjpeg decode straight to a reduced grayscale image.
+        image.draft('L', (width, width))
+        gray = np.asarray(image.convert('L'))
+    h, w = gray.shape
+    if w > width:
+        gray = cv2.resize(gray, (width, int(h * width / w)), interpolation=cv2.INTER_AREA)
+    return gray
+
+
+def layout_score(gray):
+    """
+    Positive when the image looks like a front (holder photo), negative when it
+    looks like a back (QR code), zero when the cues say nothing.
+    """
+    score = 0
+    cascade = get_face_cascade()
+    if cascade:
+        min_face = max(gray.shape[1] // 20, 20)
+        faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_face, min_face))
+        if len(faces) > 0:
+            score += 2
+    found, _ = cv2.QRCodeDetector().detect(gray)
+    if found:
+        score -= 1
+    return score
+
+
+def keyword_score(source):
+    gray = load_small_gray(source, OCR_STRIP_WIDTH)
+    text = get_engine().image_to_string(gray, psm=11).lower()
+    front = sum(kw in text for kw in FRONT_KEYWORDS)
+    back = sum(kw in text for kw in BACK_KEYWORDS)
+    return front - back
+
+
+def pick_front_back(image1, image2):
+    """
+    Decide which of two card images is the front without running the full
+    extractors. Images may be paths, bytes or decoded arrays; returns them as
+    (front, back), or None if undecided.
+    """
+    s1 = layout_score(load_small_gray(image1, CLASSIFY_WIDTH))
+    s2 = layout_score(load_small_gray(image2, CLASSIFY_WIDTH))
+    if s1 == s2:
+        # Layout cues tie: fall back to a small sparse-text OCR pass.
+        s1 = keyword_score(image1)
+        s2 = keyword_score(image2)
+    if s1 > s2:
+        return image1, image2
+    if s2 > s1:
+        return image2, image1
+    return None
@@ -0,0 +1,32 @@
+import os
+import sqlite3
+import threading
+
+
+def connect(path):
+    # Autocommit connection; callers open explicit transactions when they need them.
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+class LocalConnection:
+    """
+    One connection per thread (sqlite3 objects may not cross threads) and per
+    process (a forked worker must not reuse its parent's).
+    """
+    def __init__(self, path, schema=None):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = connect(self.path)
+            self._local.pid = os.getpid()
+            if self.schema:
+                conn.executescript(self.schema)
+        return conn
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from db import LocalConnection
+
+# ====== CONFIG ======
+DEDUPE_TTL = float(os.getenv("DEDUPE_TTL", 20))
+DEDUPE_MAX_ENTRIES = int(os.getenv("DEDUPE_MAX_ENTRIES", 10000))
+# Set to a SQLite file shared by all app processes so gunicorn workers agree.
+DEDUPE_DB = os.getenv("DEDUPE_DB")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dedupe (
+    key TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_dedupe_expires ON dedupe (expires_at);
+"""
+
+
+class MemoryDedupe:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key: expires_at, least recently set first
+        self._lock = threading.Lock()
+
+    def check_and_set(self, key, ttl):
+        now = time.time()
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is not None and expires_at > now:
+                return True
+            self._entries[key] = now + ttl
+            self._entries.move_to_end(key)
+            while self._entries:
+                oldest, expiry = next(iter(self._entries.items()))
+                if expiry > now and len(self._entries) <= self.max_entries:
+                    break
+                del self._entries[oldest]
+            return False
+
+
+class SQLiteDedupe:
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._db = LocalConnection(path, SCHEMA)
+        self._writes = 0
+
+    def _conn(self):
+        return self._db.get()
+
+    def check_and_set(self, key, ttl):
+        now = time.time()
+        conn = self._conn()
+        # The upsert only rewrites an expired row, so a live key reports 0 changes.
+        cur = conn.execute(
+            "INSERT INTO dedupe (key, expires_at) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET expires_at = excluded.expires_at WHERE dedupe.expires_at <= ?",
+            (key, now + ttl, now)
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune(conn, now)
+        return cur.rowcount == 0
+
+    def prune(self, conn, now):
+        conn.execute("DELETE FROM dedupe WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM dedupe WHERE key IN ("
+            "SELECT key FROM dedupe ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+class DedupeCache:
+    """
+    Remembers keys (Twilio MessageSids, senders) for a TTL so retried or
+    repeated webhook calls do not trigger a second OCR run.
+    """
+    def __init__(self, ttl=DEDUPE_TTL, max_entries=DEDUPE_MAX_ENTRIES, db_path=DEDUPE_DB):
+        self.ttl = ttl
+        if db_path:
+            self.backend = SQLiteDedupe(db_path, max_entries)
+        else:
+            self.backend = MemoryDedupe(max_entries)
+
+    def seen(self, key, ttl=None):
+        """
+        Record `key` and return True if it was already recorded and unexpired.
+        """
+        return self.backend.check_and_set(key, self.ttl if ttl is None else ttl)
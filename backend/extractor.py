@@ -4,6 +4,8 @@ import numpy as np
 import re
 import os
 from PIL import Image
+from classifier import pick_front_back
+from final import FRONT_CARD_FILL, normalize_resolution, text_from_ocr_data
 
 MAX_WIDTH = 500
 
@@ -63,21 +65,24 @@ def preprocess_image_full(image_stream):
     image = Image.open(image_stream).convert('RGB')
     image_np = np.array(image)
     gray = cv2.cvtColor(image_np, cv2.COLOR_RGB2GRAY)
-    resized = resize_for_display(gray)
+    resized = normalize_resolution(gray, max(gray.shape) * FRONT_CARD_FILL)
     return cv2.bilateralFilter(resized, 9, 75, 75)
 
 def preprocess_image_for_aadhaar(image_stream):
     image = Image.open(image_stream).convert('RGB')
     image_np = np.array(image)
     gray = cv2.cvtColor(image_np, cv2.COLOR_RGB2GRAY)
-    resized = resize_for_display(gray)
+    resized = normalize_resolution(gray, max(gray.shape) * FRONT_CARD_FILL)
     _, thresh = cv2.threshold(resized, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     return thresh
 
 def extract_text_with_boxes(image):
-    raw_text = pytesseract.image_to_string(image, config='--oem 3 --psm 6', lang='eng')
-    ocr_data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-    return raw_text, ocr_data
+    # One recognition pass yields the boxes, confidences and the raw text; default
+    # segmentation, as the word boxes the name is picked from always had.
+    ocr_data = pytesseract.image_to_data(
+        image, config='--oem 3', lang='eng', output_type=pytesseract.Output.DICT
+    )
+    return text_from_ocr_data(ocr_data), ocr_data
 
 def extract_raw_text_only(image):
     return pytesseract.image_to_string(image)
@@ -202,21 +207,28 @@ def extract_back_address(image_path):
 
 # === Logic to dynamically detect front and back ===
 def extract_all_fields_dynamic(image1_path, image2_path):
-    print("🔍 Detecting which image is front based on gender detection...")
-    fields_1 = extract_front_fields(image1_path)
-    fields_2 = extract_front_fields(image2_path)
-
-    if 'gender' in fields_1:
-        front_path, back_path = image1_path, image2_path
-        front_fields = fields_1
-        print(f"✅ Identified {os.path.basename(front_path)} as front")
-    elif 'gender' in fields_2:
-        front_path, back_path = image2_path, image1_path
-        front_fields = fields_2
+    print("🔍 Classifying front/back from layout cues...")
+    sides = pick_front_back(image1_path, image2_path)
+    if sides:
+        front_path, back_path = sides
+        front_fields = extract_front_fields(front_path)
         print(f"✅ Identified {os.path.basename(front_path)} as front")
     else:
-        print("❌ Could not identify front image — no gender found.")
-        return None
+        print("⚠️ Classifier undecided, falling back to gender detection...")
+        fields_1 = extract_front_fields(image1_path)
+        fields_2 = extract_front_fields(image2_path)
+
+        if 'gender' in fields_1:
+            front_path, back_path = image1_path, image2_path
+            front_fields = fields_1
+            print(f"✅ Identified {os.path.basename(front_path)} as front")
+        elif 'gender' in fields_2:
+            front_path, back_path = image2_path, image1_path
+            front_fields = fields_2
+            print(f"✅ Identified {os.path.basename(front_path)} as front")
+        else:
+            print("❌ Could not identify front image — no gender found.")
+            return None
 
     print(f"📦 Extracting address from {os.path.basename(back_path)}")
     address_text = extract_back_address(back_path)
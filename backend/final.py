@@ -1,15 +1,58 @@
-import time
 import cv2
-import pytesseract
+import io
+import logging
 import numpy as np
 import re
 import os
-from PIL import Image
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import product
+from math import prod
+from PIL import Image, UnidentifiedImageError
+from ocr_engine import get_engine
+from tracing import increment, stage
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+log = logging.getLogger(__name__)
 
 # ====== CONFIG ======
 FRONT_IMAGE_PATH = r"C:\Viresh\Projects\Web-Apps\adhaar-ocr-app\assets\front.jpg"
 BACK_IMAGE_PATH = r"C:\Viresh\Projects\Web-Apps\adhaar-ocr-app\assets\back.jpg"
 MAX_WIDTH = 500
+CARD_WIDTH_IN = 3.37  # ID-1 card, 85.6 mm
+CARD_HEIGHT_IN = 2.125  # 54 mm
+TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", 300))
+MAX_UPSCALE = float(os.getenv("OCR_MAX_UPSCALE", 1.0))
+# Share of the photo's long side a card (either side) is assumed to cover when its outline is not found.
+FRONT_CARD_FILL = float(os.getenv("OCR_FRONT_CARD_FILL", 0.8))
+# Photos are decoded at 1/2, 1/4 or 1/8 scale as long as a card covering this share of
+# the long side still reaches TARGET_DPI.
+MIN_CARD_FILL = float(os.getenv("OCR_MIN_CARD_FILL", 0.6))
+# Card outlines are searched on a copy with this long side; the corners are scaled back for the warp.
+DETECT_MAX_SIDE = int(os.getenv("OCR_DETECT_MAX_SIDE", 640))
+CARD_MIN_AREA = 0.1  # share of the frame the card outline must cover
+CARD_ASPECT = (1.2, 2.1)  # ID-1 is 1.586; allows for perspective and a coloured header band
+# Below this profile-estimate confidence the back falls back to Tesseract OSD.
+ORIENTATION_MIN_CONF = float(os.getenv("OCR_ORIENTATION_MIN_CONF", 0.5))
+# Minimum mean word confidence for a zone reading to be accepted without escalating.
+FIELD_MIN_CONF = float(os.getenv("OCR_FIELD_MIN_CONF", 60))
+# How many ESCALATIONS steps a field that failed validation may go through (0 disables them).
+MAX_ESCALATIONS = int(os.getenv("OCR_MAX_ESCALATIONS", 4))
+# Bump whenever a change alters extraction output; it invalidates cached results.
+PIPELINE_VERSION = 11
+
+
+def pipeline_fingerprint():
+    return (
+        f"v{PIPELINE_VERSION}:{get_engine().name}:dpi{TARGET_DPI}:up{MAX_UPSCALE}"
+        f":fill{FRONT_CARD_FILL}:ori{ORIENTATION_MIN_CONF}:det{DETECT_MAX_SIDE}:minfill{MIN_CARD_FILL}"
+        f":conf{FIELD_MIN_CONF}:esc{MAX_ESCALATIONS}"
+    )
 
 
 # ====== DISPLAY HELPERS ======
@@ -50,13 +93,247 @@ def four_point_transform(image, pts):
     M = cv2.getPerspectiveTransform(rect, dst)
     return cv2.warpPerspective(image, M, (maxWidth, maxHeight))
 
-def detect_orientation(image):
+def card_mask(image):
+    # Card stock is bright and unsaturated; grayscale input can only be tested for brightness.
+    if image.ndim == 2:
+        mask = cv2.inRange(image, 188, 255)
+    else:
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, np.array([0, 0, 188]), np.array([180, 60, 255]))
+    kernel = np.ones((5, 5), np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+    return cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+
+def quad_from_contour(contour):
+    hull = cv2.convexHull(contour)
+    peri = cv2.arcLength(hull, True)
+    for epsilon in (0.02, 0.04, 0.06):
+        approx = cv2.approxPolyDP(hull, epsilon * peri, True)
+        if len(approx) == 4:
+            return approx.reshape(4, 2).astype(np.float32)
+    # Rounded or occluded corners: the tightest rotated rectangle still bounds the card.
+    return cv2.boxPoints(cv2.minAreaRect(hull)).astype(np.float32)
+
+def detect_card(image):
+    """
+    Find the card outline on a downscaled copy of a BGR or grayscale image.
+    Returns its four corners in full-resolution coordinates, or None when no
+    card-sized, card-shaped region is found.
+    """
+    h, w = image.shape[:2]
+    scale = min(DETECT_MAX_SIDE / max(h, w), 1.0)
+    small = image if scale == 1.0 else cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    contours, _ = cv2.findContours(card_mask(small), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    contour = max(contours, key=cv2.contourArea)
+    if cv2.contourArea(contour) < CARD_MIN_AREA * small.shape[0] * small.shape[1]:
+        return None
+    tl, tr, br, bl = order_points(quad_from_contour(contour))
+    width = max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))
+    height = max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))
+    if min(width, height) < 1 or not CARD_ASPECT[0] <= max(width, height) / min(width, height) <= CARD_ASPECT[1]:
+        return None
+    return np.array([tl, tr, br, bl], dtype=np.float32) / scale
+
+def warp_card(image, quad, target_dpi=None):
+    """
+    Warp the card to an ID-1 shaped frame whose long side is at target_dpi
+    (or at the card's own resolution when that is lower and MAX_UPSCALE is 1).
+    """
+    tl, tr, br, bl = rect = order_points(quad)
+    natural_w = max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))
+    natural_h = max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))
+    long_side = min((target_dpi or TARGET_DPI) * CARD_WIDTH_IN, max(natural_w, natural_h) * MAX_UPSCALE)
+    short_side = long_side * CARD_HEIGHT_IN / CARD_WIDTH_IN
+    w, h = (long_side, short_side) if natural_w >= natural_h else (short_side, long_side)
+    w, h = int(round(w)), int(round(h))
+    dst = np.array([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]], dtype="float32")
+    return cv2.warpPerspective(image, cv2.getPerspectiveTransform(rect, dst), (w, h))
+
+def read_source(source):
+    # Path, file object or bytes-like -> bytes-like, without copying in-memory buffers.
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if hasattr(source, 'read'):
+        return source.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+PROBE_BYTES = 256 * 1024  # enough to reach the frame header past EXIF thumbnails
+REDUCED_FLAGS = {
+    (cv2.IMREAD_COLOR, 2): cv2.IMREAD_REDUCED_COLOR_2,
+    (cv2.IMREAD_COLOR, 4): cv2.IMREAD_REDUCED_COLOR_4,
+    (cv2.IMREAD_COLOR, 8): cv2.IMREAD_REDUCED_COLOR_8,
+    (cv2.IMREAD_GRAYSCALE, 2): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (cv2.IMREAD_GRAYSCALE, 4): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (cv2.IMREAD_GRAYSCALE, 8): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+def working_long_side(target_dpi=None):
+    # The photo long side at which a card filling MIN_CARD_FILL of it reaches target_dpi.
+    return (target_dpi or TARGET_DPI) * CARD_WIDTH_IN / MIN_CARD_FILL
+
+def decode_scale(size, min_long_side):
+    for factor in (8, 4, 2):
+        if max(size) / factor >= min_long_side:
+            return factor
+    return 1
+
+def probe_size(data):
+    # Dimensions from the header only; PIL parses markers and decodes no pixels.
     try:
-        osd = pytesseract.image_to_osd(image)
-        rotation = int(re.search(r'Rotate: (\d+)', osd).group(1))
-        return rotation
-    except:
-        return 0
+        return Image.open(io.BytesIO(bytes(memoryview(data)[:PROBE_BYTES]))).size
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+
+def decode_with_pil(data, flags, factor):
+    # Formats OpenCV cannot read (HEIC once pillow-heif is installed).
+    try:
+        image = Image.open(io.BytesIO(data))
+    except (UnidentifiedImageError, OSError):
+        return None
+    mode = 'L' if flags == cv2.IMREAD_GRAYSCALE else 'RGB'
+    transpose = EXIF_TRANSPOSE.get(image.getexif().get(0x0112))
+    target_width = max(image.width // factor, 1)
+    if factor > 1:
+        image.draft(mode, (target_width, max(image.height // factor, 1)))  # DCT scaling, JPEG only
+    image = image.convert(mode)
+    if image.width // target_width > 1:
+        image = image.reduce(image.width // target_width)
+    if transpose is not None:
+        image = image.transpose(transpose)
+    array = np.asarray(image)
+    return array if mode == 'L' else cv2.cvtColor(array, cv2.COLOR_RGB2BGR)
+
+def load_image(source, flags=cv2.IMREAD_COLOR, min_long_side=None):
+    """
+    Decode an image from a path, file object or in-memory bytes. Arrays are
+    returned as-is so an already decoded image is never decoded twice.
+
+    Large photos are decoded straight to a reduced size (JPEG DCT scaling) as
+    long as the long side stays >= min_long_side (default: working_long_side();
+    0 decodes at full size). EXIF orientation is applied.
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    data = read_source(source)
+    buf = np.frombuffer(memoryview(data), dtype=np.uint8)
+    if min_long_side is None:
+        min_long_side = working_long_side()
+    size = probe_size(data) if min_long_side else None
+    factor = decode_scale(size, min_long_side) if size else 1
+    with stage('decode', size=buf.size):
+        image = cv2.imdecode(buf, REDUCED_FLAGS.get((flags, factor), flags))
+        if image is None:
+            image = decode_with_pil(data, flags, factor)
+    if image is None:
+        raise ValueError("Could not decode image")
+    return image
+
+def to_gray(image):
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+def normalize_resolution(image, card_width_px, target_dpi=None):
+    # Resample so the card's long side lands at target_dpi; downscale only unless MAX_UPSCALE > 1.
+    if card_width_px <= 0:
+        return image
+    target_dpi = target_dpi or TARGET_DPI
+    scale = min(target_dpi * CARD_WIDTH_IN / card_width_px, MAX_UPSCALE)
+    if abs(scale - 1.0) < 0.05:
+        return image
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+    return cv2.resize(image, None, fx=scale, fy=scale, interpolation=interpolation)
+
+def ink_mask(gray, max_side=800):
+    h, w = gray.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, mask = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return mask
+
+def profile_contrast(profile):
+    mean = profile.mean()
+    return profile.std() / mean if mean > 0 else 0.0
+
+def text_lines(mask):
+    rows = mask.sum(axis=1)
+    on = rows > max(rows.max() * 0.05, 1)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], on.view(np.int8), [0]))))
+    return [(a, b) for a, b in zip(edges[::2], edges[1::2]) if b - a >= 4]
+
+def upright_votes(mask):
+    """
+    Vote for upright (>0) vs upside-down (<0) horizontal text. Latin ascenders and
+    capitals put more ink above the x-height core than descenders put below it,
+    and address lines are left aligned with a ragged right edge.
+    """
+    above = below = 0
+    starts, ends = [], []
+    for a, b in text_lines(mask):
+        band = mask[a:b]
+        rows = band.sum(axis=1)
+        core = np.flatnonzero(rows >= rows.max() * 0.5)
+        above += int(rows[:core[0]].sum())
+        below += int(rows[core[-1] + 1:].sum())
+        cols = np.flatnonzero(band.any(axis=0))
+        starts.append(cols[0])
+        ends.append(cols[-1])
+    total = above + below
+    ascender = (above - below) / total if total else 0.0
+    margin = 0.0
+    if len(starts) >= 3:
+        spread = np.std(starts) + np.std(ends)
+        margin = (np.std(ends) - np.std(starts)) / spread if spread else 0.0
+    return ascender, margin
+
+def estimate_orientation(gray):
+    """
+    Cheap orientation estimate from projection profiles. Returns the clockwise
+    rotation that makes the text upright and a confidence in [0, 1].
+    """
+    mask = ink_mask(gray)
+    horizontal = profile_contrast(mask.sum(axis=1))
+    vertical = profile_contrast(mask.sum(axis=0))
+    if max(horizontal, vertical) == 0:
+        return 0, 0.0
+    axis_conf = min(max(horizontal, vertical) / max(min(horizontal, vertical), 1e-6) - 1.0, 1.0)
+    if vertical > horizontal:
+        mask = cv2.rotate(mask, cv2.ROTATE_90_CLOCKWISE)
+    ascender, margin = upright_votes(mask)
+    upright = ascender >= 0
+    flip_conf = min(abs(ascender) * 4, 1.0)
+    if margin and (margin > 0) != upright:
+        flip_conf /= 2
+    if vertical > horizontal:
+        angle = 90 if upright else 270
+    else:
+        angle = 0 if upright else 180
+    return angle, min(axis_conf, flip_conf)
+
+def detect_orientation(image):
+    with stage('orientation', size=image.size):
+        angle, confidence = estimate_orientation(image)
+    method = 'profile'
+    if confidence < ORIENTATION_MIN_CONF:
+        try:
+            with stage('osd', size=image.size):
+                osd = get_engine().image_to_osd(image)
+            angle, confidence, method = osd['rotate'], osd['orientation_conf'], 'osd'
+        except Exception as e:
+            log.warning(f"⚠️ OSD failed ({e}), keeping profile estimate")
+    return angle, confidence, method
 
 def rotate_image(image, angle):
     if angle == 90:
@@ -69,33 +346,251 @@ def rotate_image(image, angle):
 
 
 # ====== FRONT SIDE PROCESSING ======
+class FrontImage:
+    """
+    Decode the card once into a grayscale buffer and derive the OCR views from it lazily.
+    When the card outline is found the buffer is the card warped to the canonical
+    ID-1 frame (`canonical` is True once it is landscape) so template zones apply.
+    `source` may be a path, file object, bytes or an already decoded image.
+    """
+    def __init__(self, source, target_dpi=None):
+        if isinstance(source, np.ndarray):
+            image = source
+            with stage('preprocess', size=source.size):
+                gray = to_gray(source)
+        else:
+            image = gray = load_image(source, cv2.IMREAD_GRAYSCALE)
+        with stage('warp', size=gray.size):
+            self.quad = detect_card(image)
+            if self.quad is not None:
+                self.gray = warp_card(gray, self.quad, target_dpi)
+        if self.quad is None:
+            with stage('preprocess', size=gray.size):
+                self.gray = normalize_resolution(gray, max(gray.shape) * FRONT_CARD_FILL, target_dpi)
+        self.canonical = self.quad is not None and self.gray.shape[1] > self.gray.shape[0]
+        self._filtered = None
+        self._thresholded = None
+
+    @classmethod
+    def from_page(cls, source):
+        # A rendered document page is already at working resolution and has no card outline.
+        page = cls.__new__(cls)
+        page.gray = to_gray(load_image(source, cv2.IMREAD_GRAYSCALE, min_long_side=0))
+        page.quad = None
+        page.canonical = False
+        page._filtered = None
+        page._thresholded = None
+        return page
+
+    @property
+    def filtered(self):
+        if self._filtered is None:
+            with stage('preprocess', size=self.gray.size):
+                self._filtered = cv2.bilateralFilter(self.gray, 9, 75, 75)
+        return self._filtered
+
+    @property
+    def thresholded(self):
+        if self._thresholded is None:
+            with stage('preprocess', size=self.gray.size):
+                _, self._thresholded = cv2.threshold(self.gray, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return self._thresholded
+
 def preprocess_image_full(image_stream):
-    image = Image.open(image_stream).convert('RGB')
-    image_np = np.array(image)
-    gray = cv2.cvtColor(image_np, cv2.COLOR_RGB2GRAY)
-    return cv2.bilateralFilter(gray, 9, 75, 75)
+    return FrontImage(image_stream).filtered
 
 def preprocess_image_for_aadhaar(image_stream):
-    image = Image.open(image_stream).convert('RGB')
-    image_np = np.array(image)
-    gray = cv2.cvtColor(image_np, cv2.COLOR_RGB2GRAY)
-    _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    return thresh
+    return FrontImage(image_stream).thresholded
+
+def text_from_ocr_data(ocr_data):
+    # Rebuild image_to_string-style text from the word rows: one line per
+    # (block, paragraph, line), a blank line between paragraphs.
+    lines = []
+    words = []
+    current = None
+    for i, word in enumerate(ocr_data['text']):
+        if ocr_data['level'][i] != 5:
+            continue
+        key = (ocr_data['block_num'][i], ocr_data['par_num'][i], ocr_data['line_num'][i])
+        if key != current:
+            if words:
+                lines.append(' '.join(words))
+                words = []
+            if current is not None and key[:2] != current[:2]:
+                lines.append('')
+            current = key
+        if word.strip():
+            words.append(word.strip())
+    if words:
+        lines.append(' '.join(words))
+    return '\n'.join(lines)
 
 def extract_text_with_boxes(image):
-    raw_text = pytesseract.image_to_string(image, config='--oem 3 --psm 6', lang='eng')
-    ocr_data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-    return raw_text, ocr_data
+    # One recognition pass yields the boxes, confidences and the raw text. Tesseract's
+    # default automatic segmentation (psm 3), as the word boxes always had: the name is
+    # the first two confident words in reading order, which psm 6 interleaves across columns.
+    with stage('ocr', size=image.size):
+        ocr_data = get_engine().image_to_data(image, psm=3, oem=3, lang='eng')
+    return text_from_ocr_data(ocr_data), ocr_data
 
 def extract_raw_text_only(image):
-    return pytesseract.image_to_string(image)
+    with stage('ocr', size=image.size):
+        return get_engine().image_to_string(image)
+
+# ====== AADHAAR NUMBER ======
+# Verhoeff dihedral-group tables; the last digit of every Aadhaar number is its check digit.
+VERHOEFF_D = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9), (1, 2, 3, 4, 0, 6, 7, 8, 9, 5),
+    (2, 3, 4, 0, 1, 7, 8, 9, 5, 6), (3, 4, 0, 1, 2, 8, 9, 5, 6, 7),
+    (4, 0, 1, 2, 3, 9, 5, 6, 7, 8), (5, 9, 8, 7, 6, 0, 4, 3, 2, 1),
+    (6, 5, 9, 8, 7, 1, 0, 4, 3, 2), (7, 6, 5, 9, 8, 2, 1, 0, 4, 3),
+    (8, 7, 6, 5, 9, 3, 2, 1, 0, 4), (9, 8, 7, 6, 5, 4, 3, 2, 1, 0),
+)
+VERHOEFF_P = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9), (1, 5, 7, 6, 2, 8, 3, 0, 9, 4),
+    (5, 8, 0, 3, 7, 9, 6, 1, 4, 2), (8, 9, 1, 6, 0, 4, 3, 5, 2, 7),
+    (9, 4, 5, 3, 1, 2, 6, 8, 7, 0), (4, 2, 8, 6, 5, 7, 3, 9, 0, 1),
+    (2, 7, 9, 3, 8, 0, 6, 4, 1, 5), (7, 0, 4, 6, 9, 1, 3, 2, 5, 8),
+)
+VERHOEFF_INV = (0, 4, 3, 2, 1, 5, 6, 7, 8, 9)
+# Glyphs OCR confuses with digits when no whitelist applies.
+CONFUSABLE_DIGITS = str.maketrans('OoDIli|SsB', '0001111558')
+# One line only: a run crossing a line break could join the number to the VID below it.
+NUMBER_RUN = re.compile(r'[\dOoDIli|SsB][\dOoDIli|SsB \t\-]{10,}')
+MIN_REAL_DIGITS = 10  # up to two look-alike glyphs; keeps words like "Bill" out
+# Readings disagreeing in more combinations than this are too noisy to combine:
+# each extra combination is another one-in-ten chance of a wrong number passing.
+MAX_NUMBER_CANDIDATES = 16
+
+def verhoeff_valid(digits):
+    check = 0
+    for i, d in enumerate(reversed(digits)):
+        check = VERHOEFF_D[check][VERHOEFF_P[i % 8][int(d)]]
+    return check == 0
+
+def verhoeff_check_digit(digits):
+    check = 0
+    for i, d in enumerate(reversed(digits)):
+        check = VERHOEFF_D[check][VERHOEFF_P[(i + 1) % 8][int(d)]]
+    return str(VERHOEFF_INV[check])
+
+def plausible_number(digits):
+    # UIDAI does not issue numbers starting with 0 or 1.
+    return digits[0] not in '01' and verhoeff_valid(digits)
+
+def format_number(digits):
+    return ' '.join([digits[i:i+4] for i in range(0, 12, 4)])
+
+def number_candidates(text):
+    """
+    12-digit strings the text may hold, in reading order: runs of digits and
+    look-alike glyphs on one line that hold exactly 12 of them. Longer runs, like
+    the 16-digit VID, are not cut into windows; any window passes the checksum
+    one time in ten.
+    """
+    candidates = []
+    for run in NUMBER_RUN.findall(text):
+        words = re.split(r'[ \t\-]+', run.strip())
+        # Words of look-alike letters only ("is", "Sol") are text next to the number.
+        while words and not any(c.isdigit() for c in words[0]):
+            words.pop(0)
+        while words and not any(c.isdigit() for c in words[-1]):
+            words.pop()
+        span = ''.join(words)
+        if len(span) == 12 and sum(c.isdigit() for c in span) >= MIN_REAL_DIGITS:
+            candidates.append(span.translate(CONFUSABLE_DIGITS))
+    return list(dict.fromkeys(candidates))
+
+def read_number(text):
+    # Best guess whether or not it passes the checksum; FrontFields decides.
+    candidates = number_candidates(text)
+    valid = [c for c in candidates if plausible_number(c)]
+    return format_number((valid or candidates)[0]) if candidates else None
 
 def extract_aadhaar_number(text):
-    aadhaar_raw_matches = re.findall(r'(\d[\d\s\-]{10,})', text)
-    for match in aadhaar_raw_matches:
-        digits = re.sub(r'\D', '', match)
-        if len(digits) == 12:
-            return ' '.join([digits[i:i+4] for i in range(0, 12, 4)])
+    for digits in number_candidates(text):
+        if plausible_number(digits):
+            return format_number(digits)
+    return None
+
+def resolve_number(readings):
+    """
+    Combine readings of the same number position by position and return the
+    best-supported combination that passes the checksum, or None.
+    """
+    readings = [r.replace(' ', '') for r in readings]
+    votes = [Counter(r[i] for r in readings) for i in range(12)]
+    options = [[d for d, _ in v.most_common()] for v in votes]
+    if prod(len(o) for o in options) > MAX_NUMBER_CANDIDATES:
+        return None
+    best = None
+    for combo in product(*options):
+        if plausible_number(combo):
+            score = sum(votes[i][d] for i, d in enumerate(combo))
+            if best is None or score > best[0]:
+                best = (score, combo)
+    return format_number(''.join(best[1])) if best else None
+
+# ====== AADHAAR NUMBER BAND ======
+def find_number_band_from_boxes(ocr_data):
+    # The number prints as three 4-digit words on one line; use their union box.
+    lines = {}
+    for i, word in enumerate(ocr_data['text']):
+        if re.fullmatch(r'\d{4}', word.strip()):
+            key = (ocr_data['block_num'][i], ocr_data['par_num'][i], ocr_data['line_num'][i])
+            lines.setdefault(key, []).append(i)
+    groups = [idx for idx in lines.values() if len(idx) >= 2]
+    if not groups:
+        return None
+    idx = max(groups, key=lambda g: (len(g) == 3, len(g)))
+    x1 = min(ocr_data['left'][i] for i in idx)
+    y1 = min(ocr_data['top'][i] for i in idx)
+    x2 = max(ocr_data['left'][i] + ocr_data['width'][i] for i in idx)
+    y2 = max(ocr_data['top'][i] + ocr_data['height'][i] for i in idx)
+    return x1, y1, x2 - x1, y2 - y1
+
+def find_number_bands_from_profile(thresh, max_bands=3):
+    # Text rows from the horizontal projection profile of the dark pixels.
+    # The number is the tallest line in the lower half of the card.
+    h, w = thresh.shape[:2]
+    ink_rows = np.count_nonzero(thresh < 128, axis=1) > w * 0.01
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], ink_rows.view(np.int8), [0]))))
+    bands = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        band_h = end - start
+        if start >= h // 2 and h * 0.015 <= band_h <= h * 0.12:
+            bands.append((0, int(start), w, int(band_h)))
+    bands.sort(key=lambda b: b[3], reverse=True)
+    return bands[:max_bands]
+
+def ocr_number_band(thresh, band):
+    x, y, w, h = band
+    pad_y = max(h // 2, 4)
+    pad_x = max(h, 4)
+    img_h, img_w = thresh.shape[:2]
+    crop = thresh[max(y - pad_y, 0):min(y + h + pad_y, img_h), max(x - pad_x, 0):min(x + w + pad_x, img_w)]
+    with stage('ocr', size=crop.size):
+        return get_engine().image_to_string(crop, psm=7, whitelist='0123456789')
+
+def extract_aadhaar_number_roi(thresh, ocr_data=None, use_profile=True, readings=None):
+    """
+    The first band reading that passes the checksum; the others go to `readings`.
+    """
+    bands = []
+    if ocr_data is not None:
+        band = find_number_band_from_boxes(ocr_data)
+        if band:
+            bands.append(band)
+    if use_profile:
+        bands.extend(find_number_bands_from_profile(thresh))
+    for band in bands:
+        text = ocr_number_band(thresh, band)
+        with stage('parse', size=len(text)):
+            number = extract_aadhaar_number(text)
+        if number:
+            return number
+        if readings is not None and (reading := read_number(text)):
+            readings.append(reading)
     return None
 
 def extract_remaining_fields(text, ocr_data):
@@ -123,23 +618,307 @@ def extract_remaining_fields(text, ocr_data):
                 break
     return data
 
-def extract_front_fields(image_path):
-    time.sleep(1)
-    with open(image_path, 'rb') as f1:
-        print("🔍 Preprocessing image for name/dob/gender...")
-        processed_main = preprocess_image_full(f1)
-    print("🧠 Running OCR for fields...")
-    raw_text_main, ocr_data_main = extract_text_with_boxes(processed_main)
-    with open(image_path, 'rb') as f2:
-        print("🔢 Preprocessing image for Aadhaar number...")
-        processed_aadhaar = preprocess_image_for_aadhaar(f2)
-    raw_text_aadhaar = extract_raw_text_only(processed_aadhaar)
-    aadhaar_number = extract_aadhaar_number(raw_text_aadhaar)
-    fields = extract_remaining_fields(raw_text_main, ocr_data_main)
-    if aadhaar_number:
-        fields['aadhaar_number'] = aadhaar_number
-    return fields
+# ====== FRONT TEMPLATE ======
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+NAME_IGNORE_WORDS = {'dob', 'india', 'government', 'female', 'male', 'aadhaar', 'of'}
+# Regions of the canonical landscape front as (x0, y0, x1, y1) fractions, each read with
+# its own page segmentation mode and whitelist. The outline found is the white card body
+# below the coloured header band. Measured on bench.py fronts warped to that frame, where
+# the ink of the four lines sits at y 0.12-0.18, 0.24-0.29, 0.36-0.41 and 0.71-0.79. Zones
+# split the gaps between them; the name zone extends upwards for a regional-script line.
+# `bench.py` reports how often each zone alone reads its field.
+FRONT_ZONES = {
+    'name': ((0.26, 0.04, 0.99, 0.21), 6, LETTERS + ' .'),
+    'dob': ((0.26, 0.21, 0.99, 0.33), 7, '0123456789/'),
+    'gender': ((0.26, 0.33, 0.99, 0.47), 7, LETTERS + '/'),
+    'aadhaar_number': ((0.10, 0.66, 0.90, 0.84), 7, '0123456789'),
+}
+
+def parse_name_zone(text):
+    # The English name is printed below the regional-script one, so the last match wins.
+    for line in reversed(text.splitlines()):
+        words = line.replace('.', ' ').split()
+        if len(words) >= 2 and all(w.isalpha() for w in words) and not {w.lower() for w in words} & NAME_IGNORE_WORDS:
+            return ' '.join(line.split())
+    return None
+
+def parse_dob_zone(text):
+    if m := re.search(r'\d{2}/\d{2}/\d{4}', text):
+        return m.group()
+    if m := re.search(r'\b(?:19|20)\d{2}\b', text):
+        return m.group()  # cards issued with only the year of birth
+    return None
+
+def parse_gender_zone(text):
+    if m := re.search(r'(female|male|transgender)', text.lower()):
+        return 'Other' if m.group(1) == 'transgender' else m.group(1).title()
+    return None
+
+ZONE_PARSERS = {
+    'name': parse_name_zone,
+    'dob': parse_dob_zone,
+    'gender': parse_gender_zone,
+    'aadhaar_number': read_number,
+}
+
+def crop_zone(image, box):
+    h, w = image.shape[:2]
+    x0, y0, x1, y1 = box
+    return image[int(y0 * h):int(y1 * h), int(x0 * w):int(x1 * w)]
+
+def zone_confidence(ocr_data):
+    confs = [float(c) for c, t in zip(ocr_data['conf'], ocr_data['text']) if t.strip() and float(c) >= 0]
+    return sum(confs) / len(confs) if confs else 0.0
+
+def read_zone(crop, field, psm=None):
+    """
+    OCR one zone crop; returns (parsed value or None, mean word confidence).
+    """
+    _, zone_psm, whitelist = FRONT_ZONES[field]
+    with stage('ocr', size=crop.size):
+        ocr_data = get_engine().image_to_data(crop, psm=psm or zone_psm, whitelist=whitelist)
+    text = text_from_ocr_data(ocr_data)
+    with stage('parse', size=len(text)):
+        return ZONE_PARSERS[field](text), zone_confidence(ocr_data)
+
+def read_front_zone(front, field):
+    return read_zone(crop_zone(front.gray, FRONT_ZONES[field][0]), field)
+
+def run_front_zone_pass(front, fields, pool=None):
+    """
+    OCR each missing template zone of a canonical front into `fields`.
+    Small crops are much cheaper than whole-card recognition. Returns the
+    fields whose zone held something parseable, valid or not.
+    """
+    missing = fields.missing()
+    if not front.canonical or not missing:
+        return set()
+    log.info("🧩 Reading front template zones...")
+    mapper = pool.map if pool else map
+    found = set()
+    for field, (value, conf) in zip(missing, mapper(lambda f: read_front_zone(front, f), missing)):
+        fields.offer(field, value, conf)
+        if value:
+            found.add(field)
+    return found
+
+def load_front_image(source):
+    return FrontImage(source)
+
+def run_front_fields_pass(front):
+    log.info("🧠 Running OCR for fields...")
+    raw_text, ocr_data = extract_text_with_boxes(front.filtered)
+    with stage('parse', size=len(raw_text)):
+        return ocr_data, extract_remaining_fields(raw_text, ocr_data)
+
+def run_front_number_pass(front, ocr_data=None, use_profile=True, readings=None):
+    processed_aadhaar = front.thresholded
+    aadhaar_number = extract_aadhaar_number_roi(processed_aadhaar, ocr_data, use_profile, readings)
+    if not aadhaar_number:
+        log.warning("⚠️ Number band not found, running OCR on the full card...")
+        raw_text_aadhaar = extract_raw_text_only(processed_aadhaar)
+        with stage('parse', size=len(raw_text_aadhaar)):
+            aadhaar_number = extract_aadhaar_number(raw_text_aadhaar)
+            if not aadhaar_number and readings is not None and (reading := read_number(raw_text_aadhaar)):
+                readings.append(reading)
+    return aadhaar_number
+
+def complete_front_fields(front, fields, pool=None):
+    """
+    Fill in what the template zones missed with whole-card recognition, running
+    only the passes the missing fields need. Returns the word data, if read.
+    """
+    missing = fields.missing()
+    need_number = 'aadhaar_number' in missing
+    readings = []
+    number_future = None
+    if need_number and pool:
+        number_future = pool.submit(extract_aadhaar_number_roi, front.thresholded, readings=readings)
+    ocr_data = None
+    if any(f != 'aadhaar_number' for f in missing):
+        ocr_data, whole = run_front_fields_pass(front)
+        for field, value in whole.items():
+            fields.offer(field, value)
+        if need_number:
+            # The words are read already; a number among them costs nothing.
+            fields.offer('aadhaar_number', read_number(text_from_ocr_data(ocr_data)))
+    if need_number:
+        log.info("🔢 Extracting Aadhaar number...")
+        aadhaar_number = number_future.result() if number_future else None
+        if not aadhaar_number and 'aadhaar_number' not in fields.values:
+            if number_future:
+                # The profile bands missed; retry with the word boxes of the fields pass.
+                aadhaar_number = run_front_number_pass(front, ocr_data, use_profile=False, readings=readings)
+            else:
+                aadhaar_number = run_front_number_pass(front, ocr_data, readings=readings)
+        for reading in readings:
+            fields.offer('aadhaar_number', reading)
+        fields.offer('aadhaar_number', aadhaar_number)
+    return ocr_data
+
+# ====== FRONT CASCADE ======
+def valid_name(value):
+    words = value.replace('.', ' ').split()
+    return 2 <= len(words) <= 5 and all(w.isalpha() for w in words)
+
+def valid_dob(value):
+    try:
+        born = datetime.strptime(value, '%d/%m/%Y') if '/' in value else datetime(int(value), 1, 1)
+    except ValueError:
+        return False
+    return 1900 <= born.year <= datetime.now().year
+
+def valid_gender(value):
+    return value in ('Male', 'Female', 'Other')
 
+def valid_aadhaar_number(value):
+    digits = value.replace(' ', '')
+    return len(digits) == 12 and digits.isdigit() and plausible_number(digits)
+
+FIELD_VALIDATORS = {
+    'name': valid_name,
+    'dob': valid_dob,
+    'gender': valid_gender,
+    'aadhaar_number': valid_aadhaar_number,
+}
+
+def accepted(field, value, conf=None):
+    return bool(value) and FIELD_VALIDATORS[field](value) and (conf is None or conf >= FIELD_MIN_CONF)
+
+class FrontFields:
+    """
+    Front fields gathered across passes. A value is kept once it validates and,
+    when its pass reports a word confidence, clears FIELD_MIN_CONF. Anything else
+    is remembered and only returned for fields no pass could validate, except a
+    number failing its checksum, which is certainly misread.
+    """
+    def __init__(self):
+        self.values = {}
+        self.rejected = {}
+        self.readings = defaultdict(list)
+
+    def offer(self, field, value, conf=None):
+        if not value or field in self.values:
+            return
+        self.readings[field].append(value)
+        if accepted(field, value, conf):
+            self.values[field] = value
+        elif field == 'aadhaar_number' and len(self.readings[field]) > 1 and (number := resolve_number(self.readings[field])):
+            # Readings that each fail the checksum can still agree on one that passes.
+            self.values[field] = number
+        elif field != 'aadhaar_number':
+            self.rejected.setdefault(field, value)
+
+    def missing(self):
+        return [f for f in FRONT_ZONES if f not in self.values]
+
+    def result(self):
+        return {f: self.values.get(f, self.rejected.get(f)) for f in FRONT_ZONES if f in self.values or f in self.rejected}
+
+def clahe_view(gray):
+    return cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(gray)
+
+def adaptive_view(gray):
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15)
+
+def upscale_view(gray):
+    return cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+
+# Retries for fields the first passes left unvalidated, cheapest first, as
+# (name, preprocessing, use ALTERNATE_PSM). Only the first MAX_ESCALATIONS run.
+ESCALATIONS = (
+    ('clahe', clahe_view, False),
+    ('adaptive', adaptive_view, False),
+    ('upscale', upscale_view, False),
+    ('psm', None, True),
+)
+# Zone psm 6 (block) -> 11 (sparse text), psm 7 (line) -> 13 (raw line); whole card 3 -> 11.
+ALTERNATE_PSM = {3: 11, 6: 11, 7: 13}
+
+def escalate_zone(front, field, steps, prior=()):
+    """
+    Readings of one zone, one per escalation step up to the first that is
+    accepted, alone or combined with the earlier (`prior`) readings.
+    """
+    box, psm, _ = FRONT_ZONES[field]
+    crop = crop_zone(front.gray, box)
+    seen = FrontFields()
+    seen.readings[field] = list(prior)
+    readings = []
+    for name, view, alternate in steps:
+        increment('ocr_escalations_total', step=name)
+        if view:
+            with stage('preprocess', size=crop.size):
+                image = view(crop)
+        else:
+            image = crop
+        readings.append(read_zone(image, field, ALTERNATE_PSM[psm] if alternate else None))
+        seen.offer(field, *readings[-1])
+        if field in seen.values:
+            break
+    return readings
+
+def escalate_whole_card(front, fields, steps):
+    for name, view, alternate in steps:
+        if not fields.missing():
+            return
+        increment('ocr_escalations_total', step=name)
+        if view:
+            with stage('preprocess', size=front.gray.size):
+                image = view(front.gray)
+        else:
+            image = front.gray
+        with stage('ocr', size=image.size):
+            ocr_data = get_engine().image_to_data(image, psm=ALTERNATE_PSM[3] if alternate else 3, oem=3, lang='eng')
+        text = text_from_ocr_data(ocr_data)
+        with stage('parse', size=len(text)):
+            found = extract_remaining_fields(text, ocr_data)
+            found['aadhaar_number'] = read_number(text)
+        for field in fields.missing():
+            fields.offer(field, found.get(field))
+
+def escalate_front_fields(front, fields, pool=None, max_steps=None, zone_hits=()):
+    """
+    Retry only the fields still missing with more expensive preprocessing:
+    per zone for the `zone_hits` whose zone read something that did not
+    validate, then on the whole card for whatever is left. An empty zone means
+    the text is not where the template expects it, and no preprocessing of that
+    crop will find it.
+    """
+    steps = ESCALATIONS[:MAX_ESCALATIONS if max_steps is None else max_steps]
+    missing = fields.missing()
+    if not missing or not steps:
+        return
+    log.info(f"🔁 Escalating for {', '.join(missing)}...")
+    zoned = [f for f in missing if f in zone_hits] if front.canonical else []
+    if zoned:
+        mapper = pool.map if pool else map
+        prior = {f: list(fields.readings[f]) for f in zoned}
+        for field, readings in zip(zoned, mapper(lambda f: escalate_zone(front, f, steps, prior[f]), zoned)):
+            for value, conf in readings:
+                fields.offer(field, value, conf)
+    escalate_whole_card(front, fields, steps)
+    for field in fields.missing():
+        increment('ocr_fields_unresolved_total', field=field)
+        log.warning(f"⚠️ {field} could not be validated")
+
+def run_front_cascade(front, pool=None, max_escalations=None):
+    """
+    Cheap passes first, exiting as soon as every field validates: template
+    zones, whole-card recognition for what they missed, then escalations.
+    Returns (fields, word data of the whole-card pass or None).
+    """
+    fields = FrontFields()
+    zone_hits = run_front_zone_pass(front, fields, pool)
+    ocr_data = complete_front_fields(front, fields, pool) if fields.missing() else None
+    escalate_front_fields(front, fields, pool, max_escalations, zone_hits)
+    return fields.result(), ocr_data
+
+def extract_front_fields(source, max_escalations=None):
+    log.info("🔍 Preprocessing image...")
+    front = load_front_image(source)
+    fields, _ = run_front_cascade(front, max_escalations=max_escalations)
+    return fields
 
 # ====== BACK SIDE PROCESSING ======
 def extract_address_and_pincode(text):
@@ -161,59 +940,42 @@ def extract_address_and_pincode(text):
             address_lines.append(clean)
     return ' '.join(address_lines).strip(), pincode
 
-def extract_back_address(image_path):
-    time.sleep(1)
-    img = cv2.imread(image_path)
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    lower_white = np.array([0, 0, 188])
-    upper_white = np.array([180, 60, 255])
-    mask = cv2.inRange(hsv, lower_white, upper_white)
-    kernel = np.ones((5, 5), np.uint8)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    card_contour = max(contours, key=cv2.contourArea)
-    peri = cv2.arcLength(card_contour, True)
-    approx = cv2.approxPolyDP(card_contour, 0.02 * peri, True)
-    try:
-        if approx.shape[0] != 4:
-            print(f"⚠️ Detected contour with shape {approx.shape}, using bounding rectangle fallback")
-            x, y, w, h = cv2.boundingRect(approx)
-            box = np.array([
-                [x, y],
-                [x + w, y],
-                [x + w, y + h],
-                [x, y + h]
-            ], dtype=np.float32)
-        else:
-            box = approx.reshape(4, 2)
-
-        warped = four_point_transform(img, box)
-    except Exception as e:
-        print(f"❌ Contour transform failed: {e}")
-        return None, None
+def read_back_text(source):
+    img = load_image(source)
+    with stage('warp', size=img.shape[0] * img.shape[1]):
+        quad = detect_card(img)
+        if quad is not None:
+            # One resampling straight to the working resolution, as on the front.
+            warped = warp_card(img, quad)
+    if quad is None:
+        log.warning("⚠️ Card outline not found, using the full frame")
+        # As on the front: without an outline the card is assumed to fill part of the frame.
+        with stage('preprocess', size=img.shape[0] * img.shape[1]):
+            warped = normalize_resolution(img, max(img.shape[:2]) * FRONT_CARD_FILL)
     h, w = warped.shape[:2]
-    print(f"📐 Warped image size: {w}x{h}")
+    log.info(f"📐 Warped image size: {w}x{h}")
     if w >= h:
         selected = warped[:, w//2:]
-        print("📊 Orientation: Landscape → Selected Right Half")
+        log.info("📊 Orientation: Landscape → Selected Right Half")
     else:
         selected = warped[h//2:, :]
-        print("📊 Orientation: Portrait → Selected Bottom Half")
-    print("🧭 Detecting orientation...")
-    rotation = detect_orientation(cv2.cvtColor(selected, cv2.COLOR_BGR2GRAY))
-    rotated = rotate_image(selected, rotation)
-    print(f"🔄 Detected rotation: {rotation}° → Image rotated.")
-    print("🧠 Running OCR...")
-    text = pytesseract.image_to_string(
-        cv2.cvtColor(rotated, cv2.COLOR_BGR2GRAY),
-        config='--oem 3 --psm 6',
-        lang='eng'
-    )
-    print("\n===== RAW OCR TEXT =====")
-    print(text)
-    print("\n📦 Extracting structured address...")
-    return extract_address_and_pincode(text)
+        log.info("📊 Orientation: Portrait → Selected Bottom Half")
+    log.info("🧭 Detecting orientation...")
+    rotation, confidence, method = detect_orientation(cv2.cvtColor(selected, cv2.COLOR_BGR2GRAY))
+    with stage('preprocess', size=selected.shape[0] * selected.shape[1]):
+        rotated = cv2.cvtColor(rotate_image(selected, rotation), cv2.COLOR_BGR2GRAY)
+    log.info(f"🔄 Detected rotation: {rotation}° (confidence {confidence:.2f} via {method}) → Image rotated.")
+    log.info("🧠 Running OCR...")
+    with stage('ocr', size=rotated.size):
+        text = get_engine().image_to_string(rotated, psm=6, oem=3, lang='eng')
+    log.debug("===== RAW OCR TEXT =====\n%s", text)
+    return text
+
+def extract_back_address(source):
+    text = read_back_text(source)
+    log.info("📦 Extracting structured address...")
+    with stage('parse', size=len(text)):
+        return extract_address_and_pincode(text)
 
 
 # ====== MAIN ======
@@ -0,0 +1,205 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import tracing
+from db import connect
+from media import Media, wait_for_archive
+from pipeline import process_page, process_submission
+
+log = logging.getLogger(__name__)
+
+# ====== CONFIG ======
+JOBS_DB = os.getenv("JOBS_DB", "jobs.db")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", 2))
+POLL_INTERVAL = 0.5
+STALE_AFTER = 600  # seconds a running job may take before another worker picks it up again
+MAX_ATTEMPTS = 3
+SUPERVISE_INTERVAL = 5  # seconds between checks for dead worker processes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    phone_number TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
+-- Job images used to be queued here as BLOBs; workers now read the archived files.
+DROP TABLE IF EXISTS job_media;
+"""
+
+
+# ====== QUEUE ======
+def open_queue(path=None):
+    conn = connect(path or JOBS_DB)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def enqueue_job(from_number, media, conn=None, kind="pair"):
+    # Only paths are queued; workers read the files the webhook is archiving (see media.py).
+    # kind: "pair" of card photos, or "page" rendered from a PDF without a text layer.
+    conn = conn or open_queue()
+    payload = json.dumps({"kind": kind, "image_paths": [item.path for item in media]})
+    cur = conn.execute(
+        "INSERT INTO jobs (phone_number, payload, created_at) VALUES (?, ?, ?)",
+        (from_number, payload, time.time())
+    )
+    return cur.lastrowid
+
+
+def claim_job(conn):
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Jobs left 'running' by a crashed worker go back on the queue, unless they have
+        # used up their attempts: one that kills its worker would otherwise loop forever.
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'worker died while running the job', finished_at = ? "
+            "WHERE status = 'running' AND started_at < ? AND attempts >= ?",
+            (now, now - STALE_AFTER, MAX_ATTEMPTS)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND started_at < ?",
+            (now - STALE_AFTER,)
+        )
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ? WHERE id = ?",
+            (now, row["id"])
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return row
+
+
+def complete_job(conn, job_id, result):
+    conn.execute(
+        "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ? WHERE id = ?",
+        (json.dumps(result), time.time(), job_id)
+    )
+
+
+def fail_job(conn, job_id, attempts, error):
+    status = 'failed' if attempts >= MAX_ATTEMPTS else 'queued'
+    conn.execute(
+        "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+        (status, error, time.time(), job_id)
+    )
+
+
+# What /jobs/<id> may show: job ids are guessable and results carry the card holder's details.
+JOB_STATUS_COLUMNS = ("id", "status", "attempts", "created_at", "started_at", "finished_at")
+
+
+def get_job_status(job_id, conn=None):
+    conn = conn or open_queue()
+    row = conn.execute(
+        f"SELECT {', '.join(JOB_STATUS_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def queue_depth(conn=None):
+    conn = conn or open_queue()
+    rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+    return {row["status"]: row["n"] for row in rows}
+
+
+# ====== WORKERS ======
+def run_job(conn, job):
+    payload = json.loads(job["payload"])
+    log.info(f"⚙️ Worker {os.getpid()} running job {job['id']} for {job['phone_number']}")
+    start = time.perf_counter()
+    try:
+        media = [Media(wait_for_archive(path)) for path in payload["image_paths"]]
+        if payload.get("kind") == "page":
+            result = process_page(job["phone_number"], media[0])
+        else:
+            result = process_submission(job["phone_number"], media)
+    except Exception as e:
+        log.error(f"❌ Job {job['id']} failed: {e}")
+        tracing.increment('ocr_jobs_failed_total')
+        fail_job(conn, job["id"], job["attempts"] + 1, str(e))
+        return
+    finally:
+        tracing.observe('ocr_job_seconds', time.perf_counter() - start)
+    if result is None:
+        # The images were read but neither is a card front; retrying would not change that.
+        log.error(f"❌ Job {job['id']} failed: no Aadhaar front found")
+        tracing.increment('ocr_jobs_failed_total')
+        fail_job(conn, job["id"], MAX_ATTEMPTS, "could not identify the front image")
+        return
+    complete_job(conn, job["id"], result)
+    tracing.increment('ocr_jobs_completed_total')
+    log.info(f"✅ Job {job['id']} done")
+
+
+def worker_loop(stop_event=None):
+    # A no-op under fork, where the parent's logging config is inherited; spawned workers need it.
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(message)s")
+    conn = open_queue()
+    while stop_event is None or not stop_event.is_set():
+        job = claim_job(conn)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        run_job(conn, job)
+        tracing.dump()
+
+
+def start_worker(stop_event=None):
+    p = multiprocessing.Process(target=worker_loop, args=(stop_event,), daemon=True)
+    p.start()
+    return p
+
+
+def supervise(workers, stop_event=None, interval=SUPERVISE_INTERVAL):
+    # A worker killed mid-job (segfault, OOM kill in Tesseract) never comes back on its
+    # own; replace it so the pool keeps its size. Its job is requeued once stale.
+    while True:
+        time.sleep(interval)
+        if stop_event is not None and stop_event.is_set():
+            return
+        for i, p in enumerate(workers):
+            if not p.is_alive():
+                log.warning(f"⚠️ OCR worker {p.pid} exited with code {p.exitcode}, restarting it")
+                workers[i] = start_worker(stop_event)
+
+
+def start_worker_pool(num_workers=OCR_WORKERS, stop_event=None):
+    open_queue().close()
+    # Dumps from a previous run's workers would be summed in forever.
+    tracing.clear_dumps()
+    workers = [start_worker(stop_event) for _ in range(num_workers)]
+    threading.Thread(target=supervise, args=(workers, stop_event), daemon=True).start()
+    log.info(f"👷 Started {num_workers} OCR workers")
+    return workers
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(message)s")
+    stop = multiprocessing.Event()
+    start_worker_pool(OCR_WORKERS, stop)
+    try:
+        # The supervisor keeps the pool running; this process only waits for Ctrl+C.
+        while not stop.wait(1):
+            pass
+    except KeyboardInterrupt:
+        stop.set()
@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+log = logging.getLogger(__name__)
+
+# ====== CONFIG ======
+MEDIA_CONNECT_TIMEOUT = float(os.getenv("MEDIA_CONNECT_TIMEOUT", 5))
+MEDIA_READ_TIMEOUT = float(os.getenv("MEDIA_READ_TIMEOUT", 20))
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_BYTES", 20 * 1024 * 1024))
+MEDIA_RETRIES = int(os.getenv("MEDIA_RETRIES", 3))
+MEDIA_FETCH_WORKERS = int(os.getenv("MEDIA_FETCH_WORKERS", 4))
+# How long an OCR worker waits for the webhook's background archive write of a job's images.
+ARCHIVE_WAIT_TIMEOUT = float(os.getenv("ARCHIVE_WAIT_TIMEOUT", 60))
+CHUNK_SIZE = 64 * 1024
+
+
+class MediaTooLarge(Exception):
+    pass
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    # One pooled keep-alive session per process, shared by every download thread.
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=MEDIA_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=("GET",),
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=MEDIA_FETCH_WORKERS,
+                    pool_maxsize=MEDIA_FETCH_WORKERS * 2,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+class Media:
+    """
+    One uploaded image: where it is archived on disk and, until the archive
+    write completes, its bytes.
+    """
+    def __init__(self, path, data=None):
+        self.path = path
+        self.data = data
+
+    def read(self):
+        data = self.data  # dropped by the archiver once the file is complete
+        if data is None:
+            with open(self.path, "rb") as f:
+                return f.read()
+        return data
+
+    def __repr__(self):
+        return f"Media({self.path!r}, {'in memory' if self.data is not None else 'on disk'})"
+
+
+def download_media(url, auth=None, max_bytes=MEDIA_MAX_BYTES):
+    """
+    Stream one media file into memory, enforcing the size cap as it arrives.
+    """
+    with get_session().get(
+        url, auth=auth, stream=True, timeout=(MEDIA_CONNECT_TIMEOUT, MEDIA_READ_TIMEOUT)
+    ) as response:
+        response.raise_for_status()
+        length = response.headers.get("Content-Length")
+        if length and int(length) > max_bytes:
+            raise MediaTooLarge(f"{url} is {length} bytes (limit {max_bytes})")
+        data = bytearray()
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            data += chunk
+            if len(data) > max_bytes:
+                raise MediaTooLarge(f"{url} exceeded {max_bytes} bytes")
+    return data
+
+
+def write_archive(path, data):
+    # The file only appears under its final name once complete.
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def wait_for_archive(path, timeout=ARCHIVE_WAIT_TIMEOUT, interval=0.05):
+    # The final name only appears once write_archive has renamed the .part file.
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise FileNotFoundError(f"{path} was not archived within {timeout:g}s")
+        time.sleep(interval)
+    return path
+
+
+def archive_and_release(media):
+    write_archive(media.path, media.data)
+    # From here on the file serves every reader; don't keep megabytes per pending image.
+    media.data = None
+    return media.path
+
+
+_archiver = None
+
+
+def archive_media(media):
+    """
+    Write media to its archive path in the background, then drop its bytes.
+    """
+    global _archiver
+    if _archiver is None:
+        with _session_lock:
+            if _archiver is None:
+                _archiver = ThreadPoolExecutor(max_workers=1)
+    return _archiver.submit(archive_and_release, media)
+
+
+def fetch_all(downloads, auth=None):
+    """
+    Download [(url, archive_path), ...] concurrently into memory and queue
+    each for archival. Returns Media in input order, None where it failed.
+    """
+    def fetch(item):
+        url, path = item
+        try:
+            data = download_media(url, auth)
+        except Exception as e:
+            log.error(f"❌ Failed to download {url}: {e}")
+            return None
+        media = Media(path, data)
+        archive_media(media)
+        log.info(f"✅ Received {os.path.basename(path)} ({len(data)} bytes)")
+        return media
+
+    if len(downloads) == 1:
+        return [fetch(downloads[0])]
+    with ThreadPoolExecutor(max_workers=min(MEDIA_FETCH_WORKERS, len(downloads))) as pool:
+        return list(pool.map(fetch, downloads))
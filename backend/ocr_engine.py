@@ -0,0 +1,154 @@
+import logging
+import os
+import re
+import threading
+import cv2
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+log = logging.getLogger(__name__)
+
+# ====== CONFIG ======
+# auto: use a persistent tesserocr handle when available, else pytesseract.
+OCR_ENGINE = os.getenv("OCR_ENGINE", "auto")
+TSV_COLUMNS = [
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height", "conf", "text"
+]
+
+
+def to_pil(image):
+    if isinstance(image, Image.Image):
+        return image
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return Image.fromarray(image)
+
+
+def parse_tsv(tsv):
+    data = {col: [] for col in TSV_COLUMNS}
+    for line in tsv.splitlines():
+        parts = line.split('\t')
+        if len(parts) < 11 or parts[0] == 'level':
+            continue
+        parts += [''] * (12 - len(parts))
+        for col, value in zip(TSV_COLUMNS[:10], parts[:10]):
+            data[col].append(int(value))
+        data['conf'].append(float(parts[10]))
+        data['text'].append(parts[11])
+    return data
+
+
+class PytesseractEngine:
+    """
+    Fallback engine: one tesseract subprocess per call.
+    """
+    name = "pytesseract"
+
+    def _config(self, psm, oem, whitelist):
+        parts = []
+        if oem is not None:
+            parts.append(f"--oem {oem}")
+        if psm is not None:
+            parts.append(f"--psm {psm}")
+        if whitelist:
+            parts.append(f"-c tessedit_char_whitelist={whitelist}")
+        return ' '.join(parts)
+
+    def image_to_string(self, image, psm=None, oem=None, lang='eng', whitelist=None):
+        return pytesseract.image_to_string(image, config=self._config(psm, oem, whitelist), lang=lang)
+
+    def image_to_data(self, image, psm=None, oem=None, lang='eng', whitelist=None):
+        return pytesseract.image_to_data(
+            image, config=self._config(psm, oem, whitelist), lang=lang,
+            output_type=pytesseract.Output.DICT
+        )
+
+    def image_to_osd(self, image):
+        osd = pytesseract.image_to_osd(image)
+        return {
+            'rotate': int(re.search(r'Rotate: (\d+)', osd).group(1)),
+            'orientation_conf': float(re.search(r'Orientation confidence: ([\d.]+)', osd).group(1)),
+        }
+
+
+class TesserocrEngine:
+    """
+    Long-lived libtesseract handles, one per thread and (lang, oem), so the
+    traineddata is loaded once per worker instead of once per call.
+    """
+    name = "tesserocr"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _api(self, lang, oem, psm):
+        apis = self._local.__dict__.setdefault('apis', {})
+        key = (lang, oem)
+        if key not in apis:
+            oem = tesserocr.OEM.DEFAULT if oem is None else oem
+            apis[key] = tesserocr.PyTessBaseAPI(lang=lang, oem=oem)
+        api = apis[key]
+        api.SetPageSegMode(tesserocr.PSM.AUTO if psm is None else psm)
+        return api
+
+    def _prepare(self, image, psm, oem, lang, whitelist):
+        api = self._api(lang, oem, psm)
+        api.SetVariable('tessedit_char_whitelist', whitelist or '')
+        api.SetImage(to_pil(image))
+        return api
+
+    def image_to_string(self, image, psm=None, oem=None, lang='eng', whitelist=None):
+        return self._prepare(image, psm, oem, lang, whitelist).GetUTF8Text()
+
+    def image_to_data(self, image, psm=None, oem=None, lang='eng', whitelist=None):
+        api = self._prepare(image, psm, oem, lang, whitelist)
+        api.Recognize()
+        return parse_tsv(api.GetTSVText(0))
+
+    def image_to_osd(self, image):
+        api = getattr(self._local, 'osd', None)
+        if api is None:
+            api = self._local.osd = tesserocr.PyTessBaseAPI(
+                lang='osd', psm=tesserocr.PSM.OSD_ONLY
+            )
+        api.SetImage(to_pil(image))
+        result = api.DetectOrientationScript()
+        if not result:
+            raise RuntimeError("OSD could not determine orientation")
+        return {
+            'rotate': (360 - result['orient_deg']) % 360,
+            'orientation_conf': result['orient_conf'],
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def create_engine(kind=OCR_ENGINE):
+    if kind in ("auto", "tesserocr") and tesserocr is not None:
+        try:
+            engine = TesserocrEngine()
+            engine._api('eng', None, None)
+            return engine
+        except Exception as e:
+            log.warning(f"⚠️ tesserocr unavailable ({e}), falling back to pytesseract")
+    elif kind == "tesserocr":
+        log.warning("⚠️ tesserocr is not installed, falling back to pytesseract")
+    return PytesseractEngine()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine()
+                log.info(f"🧠 OCR engine: {_engine.name}")
+    return _engine
@@ -0,0 +1,215 @@
+"""
+e-Aadhaar PDF ingestion.
+
+UIDAI's e-Aadhaar carries a text layer, so the fields are read straight from
+it. Tesseract is only needed when the layer is missing or unusable (scanned
+or printed-and-photographed PDFs). In that case the first page is rendered
+and OCR'd by a worker. The PDFs are password protected; the password is the
+first four letters of the name in capitals followed by the year of birth.
+"""
+import logging
+import os
+import re
+import time
+from db import LocalConnection
+from final import (
+    FrontImage, TARGET_DPI, extract_aadhaar_number, extract_address_and_pincode,
+    run_front_fields_pass, run_front_number_pass, text_from_ocr_data
+)
+from media import Media
+from tracing import stage
+
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # PyMuPDF < 1.24
+    except ImportError:
+        pymupdf = None
+
+log = logging.getLogger(__name__)
+
+# ====== CONFIG ======
+PDF_RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", TARGET_DPI))
+PDF_PASSWORD_TTL = float(os.getenv("PDF_PASSWORD_TTL", 15 * 60))
+PDF_PASSWORD_ATTEMPTS = int(os.getenv("PDF_PASSWORD_ATTEMPTS", 3))
+# Shared by every app process: the password reply may reach a different worker than the PDF.
+PENDING_PDFS_DB = os.getenv("PENDING_PDFS_DB", "pending_pdfs.db")
+# A text layer is trusted when it yields these; a masked e-Aadhaar has no full number.
+PDF_REQUIRED_FIELDS = ('name', 'dob')
+PDF_CONTENT_TYPE = "application/pdf"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_pdfs (
+    sender TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+NAME_LINE = re.compile(r"[A-Za-z][A-Za-z .']{1,60}")
+IGNORE_WORDS = {'dob', 'india', 'government', 'female', 'male', 'aadhaar', 'address', 'enrolment', 'to'}
+
+
+class PdfUnavailable(Exception):
+    pass
+
+
+class PasswordRequired(Exception):
+    pass
+
+
+class WrongPassword(PasswordRequired):
+    pass
+
+
+def open_pdf(data, password=None):
+    if pymupdf is None:
+        raise PdfUnavailable("PyMuPDF is not installed (pip install pymupdf)")
+    doc = pymupdf.open(stream=bytes(data), filetype="pdf")
+    if doc.needs_pass:
+        if password is None:
+            doc.close()
+            raise PasswordRequired("PDF is password protected")
+        # e-Aadhaar passwords are upper case; people often type them otherwise.
+        if not any(doc.authenticate(p) for p in dict.fromkeys((password.strip(), password.strip().upper()))):
+            doc.close()
+            raise WrongPassword("Wrong PDF password")
+    return doc
+
+
+# ====== TEXT LAYER ======
+def find_date_of_birth(lines):
+    for i, line in enumerate(lines):
+        low = line.lower()
+        if 'dob' not in low and 'birth' not in low:
+            continue
+        for candidate in lines[i:i + 2]:
+            if m := re.search(r'\d{2}/\d{2}/\d{4}', candidate):
+                return i, m.group()
+            if m := re.search(r'\b(?:19|20)\d{2}\b', candidate):
+                return i, m.group()
+    return None, None
+
+
+def text_layer_fields(text):
+    """
+    Fields from the text of an e-Aadhaar: the name is the English line just
+    above the date of birth, as printed on the card strip.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    fields = {}
+
+    dob_index, dob = find_date_of_birth(lines)
+    if dob:
+        fields['dob'] = dob
+        for line in reversed(lines[max(dob_index - 3, 0):dob_index]):
+            if NAME_LINE.fullmatch(line) and not set(line.lower().split()) & IGNORE_WORDS:
+                fields['name'] = ' '.join(line.split())
+                break
+
+    for line in lines:
+        if m := re.search(r'\b(female|male|transgender)\b', line.lower()):
+            fields['gender'] = 'Other' if m.group(1) == 'transgender' else m.group(1).title()
+            break
+
+    # Line by line: the greedy number pattern would otherwise run into the next line's digits.
+    for line in lines:
+        if number := extract_aadhaar_number(line):
+            fields['aadhaar_number'] = number
+            break
+
+    # "Address: S/O ..." keeps its first line on the label line; split it off for the parser.
+    address_text = re.sub(r'(?im)^(.*\baddress\s*:)[ \t]*(\S.*)$', r'\1\n\2', '\n'.join(lines))
+    address, pincode = extract_address_and_pincode(address_text)
+    if address:
+        fields['address'] = address
+    if pincode:
+        fields['pincode'] = pincode
+    return fields
+
+
+def render_page(doc, index=0, dpi=None):
+    pix = doc[index].get_pixmap(dpi=dpi or PDF_RENDER_DPI, colorspace=pymupdf.csGRAY)
+    return pix.tobytes("png")
+
+
+def extract_pdf(data, password=None):
+    """
+    Returns (fields, None) when the text layer is usable, else (None, png) with
+    the first page rendered for OCR. Raises PasswordRequired / WrongPassword.
+    """
+    with stage('pdf', size=len(data)):
+        doc = open_pdf(data, password)
+        try:
+            text = '\n'.join(page.get_text() for page in doc)
+            fields = text_layer_fields(text)
+            if all(f in fields for f in PDF_REQUIRED_FIELDS):
+                log.info(f"📄 Read {len(fields)} fields from the PDF text layer")
+                return fields, None
+            log.warning("⚠️ PDF has no usable text layer, rendering it for OCR")
+            return None, render_page(doc)
+        finally:
+            doc.close()
+
+
+# ====== OCR FALLBACK ======
+def extract_page_fields(source):
+    """
+    OCR a rendered document page: the whole page is one text block, so one
+    recognition pass yields the front fields and the address together.
+    """
+    page = FrontImage.from_page(source)
+    ocr_data, fields = run_front_fields_pass(page)
+    aadhaar_number = run_front_number_pass(page, ocr_data, use_profile=False)
+    if aadhaar_number:
+        fields['aadhaar_number'] = aadhaar_number
+    fields['address'], fields['pincode'] = extract_address_and_pincode(text_from_ocr_data(ocr_data))
+    return fields
+
+
+# ====== PASSWORD PROMPTS ======
+class PendingPdfs:
+    """
+    Password-protected PDFs waiting for their sender's next text message,
+    which is taken as the password. Only the archive path is kept.
+    """
+    def __init__(self, ttl=PDF_PASSWORD_TTL, max_attempts=PDF_PASSWORD_ATTEMPTS, path=PENDING_PDFS_DB):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self._db = LocalConnection(path, SCHEMA)
+
+    def add(self, sender, media):
+        self._db.get().execute(
+            "INSERT OR REPLACE INTO pending_pdfs (sender, path, expires_at, attempts) VALUES (?, ?, ?, 0)",
+            (sender, media.path, time.time() + self.ttl)
+        )
+
+    def get(self, sender):
+        conn = self._db.get()
+        conn.execute("DELETE FROM pending_pdfs WHERE expires_at <= ?", (time.time(),))
+        row = conn.execute("SELECT path FROM pending_pdfs WHERE sender = ?", (sender,)).fetchone()
+        return Media(row["path"]) if row else None
+
+    def failed_attempt(self, sender):
+        """
+        Count a wrong password; returns how many tries are left (0 drops the PDF).
+        """
+        conn = self._db.get()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "UPDATE pending_pdfs SET attempts = attempts + 1 WHERE sender = ? RETURNING attempts", (sender,)
+            ).fetchone()
+            remaining = self.max_attempts - row["attempts"] if row else 0
+            if row and remaining <= 0:
+                conn.execute("DELETE FROM pending_pdfs WHERE sender = ?", (sender,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return max(remaining, 0)
+
+    def discard(self, sender):
+        self._db.get().execute("DELETE FROM pending_pdfs WHERE sender = ?", (sender,))
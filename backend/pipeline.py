@@ -0,0 +1,169 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from classifier import pick_front_back
+from final import (
+    extract_address_and_pincode, extract_back_address, extract_front_fields, load_front_image,
+    load_image, pipeline_fingerprint, read_back_text, run_front_cascade
+)
+from pdf_ingest import extract_page_fields
+from result_cache import ResultCache, cache_key, content_digest
+from store import RESULTS_DB, insert_record
+from tracing import stage
+
+log = logging.getLogger(__name__)
+
+# Threads per OCR job for the independent passes; OpenCV and Tesseract release the GIL.
+OCR_PASS_WORKERS = int(os.getenv("OCR_PASS_WORKERS", 3))
+
+_executor = None
+_executor_pid = None
+result_cache = ResultCache()
+
+
+def get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=OCR_PASS_WORKERS)
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def save_result(result):
+    try:
+        insert_record(result)
+        log.info(f"📁 Data saved to {RESULTS_DB}")
+    except Exception as e:
+        log.error(f"❌ Failed to save result: {e}")
+
+
+def safe_back_address(back_image):
+    try:
+        return extract_back_address(back_image)
+    except Exception as e:
+        log.error(f"❌ Address extraction error: {e}")
+        return None, None
+
+
+def safe_back_text(back_image):
+    try:
+        return read_back_text(back_image)
+    except Exception as e:
+        log.error(f"❌ Address extraction error: {e}")
+        return None
+
+
+def run_front_passes(front_image, pool):
+    front = load_front_image(front_image)
+    fields, ocr_data = run_front_cascade(front, pool)
+    return {'side': 'front', 'fields': fields, 'ocr_data': ocr_data}
+
+
+def extract_submission(front_image, back_image, front_entry=None, back_entry=None):
+    """
+    Run the front cascade and the back address pass concurrently; wall time
+    tends to the slowest pass instead of their sum.
+    Sides with a cached entry are not processed again.
+    """
+    pool = get_executor()
+    back_future = None if back_entry else pool.submit(safe_back_text, back_image)
+    if front_entry is None:
+        front_entry = run_front_passes(front_image, pool)
+    if back_future:
+        text = back_future.result()
+        if text is not None:
+            log.info("📦 Extracting structured address...")
+            with stage('parse', size=len(text)):
+                address, pincode = extract_address_and_pincode(text)
+            back_entry = {'side': 'back', 'text': text, 'address': address, 'pincode': pincode}
+    return front_entry, back_entry
+
+
+def cached_as(entry, side):
+    return entry if entry and entry.get('side') == side else None
+
+
+def process_submission(from_number, media, save=True, use_cache=True):
+    img1, img2 = (item.path for item in media[:2])
+    data = {item.path: item.read() for item in media[:2]}
+
+    fingerprint = pipeline_fingerprint()
+    keys = {img: cache_key('image', content_digest(data[img]), fingerprint) for img in (img1, img2)}
+    # Batch re-runs skip the cache: they want fresh results and must not evict the service's entries.
+    cached = {img: result_cache.get(key) if use_cache else None for img, key in keys.items()}
+
+    sides = None
+    for front_img, back_img in ((img1, img2), (img2, img1)):
+        if cached_as(cached[front_img], 'front') or cached_as(cached[back_img], 'back'):
+            log.info("⚡ Result cache hit")
+            sides = front_img, back_img
+            break
+
+    # Each image is decoded at most once, straight from memory.
+    decoded = {}
+    if sides is None:
+        decoded = {img: load_image(data[img]) for img in (img1, img2)}
+        log.info("🔍 Classifying FRONT/BACK from layout cues...")
+        picked = pick_front_back(decoded[img1], decoded[img2])
+        if picked:
+            sides = (img1, img2) if picked[0] is decoded[img1] else (img2, img1)
+
+    if sides:
+        front_img, back_img = sides
+        log.info(f"✅ Identified {os.path.basename(front_img)} as FRONT")
+        log.info(f"📦 Processing address from {os.path.basename(back_img)}")
+        front_entry = cached_as(cached[front_img], 'front')
+        back_entry = cached_as(cached[back_img], 'back')
+        for img, entry in ((front_img, front_entry), (back_img, back_entry)):
+            if entry is None and img not in decoded:
+                decoded[img] = load_image(data[img])
+        new_front, new_back = extract_submission(
+            decoded.get(front_img), decoded.get(back_img), front_entry, back_entry
+        )
+        for img, entry, old in ((front_img, new_front, front_entry), (back_img, new_back, back_entry)):
+            if use_cache and entry is not None and old is None:
+                result_cache.put(keys[img], entry)
+        front_fields = dict(new_front['fields'])
+        address, pincode = (new_back['address'], new_back['pincode']) if new_back else (None, None)
+    else:
+        log.warning("⚠️ Classifier undecided, falling back to gender detection...")
+        # One of the two is the back; escalating on it would only burn OCR passes.
+        fields1 = extract_front_fields(decoded[img1], max_escalations=0)
+        fields2 = extract_front_fields(decoded[img2], max_escalations=0)
+
+        if 'gender' in fields1:
+            front_img, back_img, front_fields = img1, img2, fields1
+        elif 'gender' in fields2:
+            front_img, back_img, front_fields = img2, img1, fields2
+        else:
+            log.error("❌ Could not identify front image.")
+            return None
+
+        log.info(f"✅ Identified {os.path.basename(front_img)} as FRONT")
+        log.info(f"📦 Processing address from {os.path.basename(back_img)}")
+        address, pincode = safe_back_address(decoded[back_img])
+
+    result = front_fields
+    result['address'] = address
+    result['pincode'] = pincode
+    return finish_result(result, from_number, save)
+
+
+def process_page(from_number, media, save=True):
+    # A rendered e-Aadhaar page whose PDF had no usable text layer.
+    fields = extract_page_fields(media.read())
+    return finish_result(fields, from_number, save)
+
+
+def finish_result(result, from_number, save=True):
+    result.setdefault('address', None)
+    result.setdefault('pincode', None)
+    result['timestamp'] = datetime.now().isoformat()
+    result['phone_number'] = from_number
+
+    log.debug("======= FINAL EXTRACTED DATA =======\n%s", "\n".join(f"{k}: {v}" for k, v in result.items()))
+
+    if save:
+        save_result(result)
+    return result
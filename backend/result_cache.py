@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+import time
+import tracing
+from db import LocalConnection
+
+# ====== CONFIG ======
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB", "result_cache.db")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_access ON results (last_access);
+"""
+
+
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(kind, digest, fingerprint):
+    return f"{kind}:{fingerprint}:{digest}"
+
+
+class ResultCache:
+    """
+    On-disk LRU of extraction results keyed by image content hash, pipeline
+    version and config. Bounded to max_bytes of stored JSON.
+    """
+    def __init__(self, path=RESULT_CACHE_DB, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._db = LocalConnection(path, SCHEMA)
+
+    def _conn(self):
+        return self._db.get()
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            tracing.increment('ocr_result_cache_misses_total')
+            return None
+        conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+        tracing.increment('ocr_result_cache_hits_total')
+        return json.loads(row["value"])
+
+    def put(self, key, value):
+        conn = self._conn()
+        payload = json.dumps(value)
+        conn.execute(
+            "INSERT OR REPLACE INTO results (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, payload, len(payload), time.time())
+        )
+        self.evict(conn)
+
+    def evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for row in conn.execute("SELECT key, size FROM results ORDER BY last_access"):
+            victims.append((row["key"],))
+            freed += row["size"]
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM results WHERE key = ?", victims)
@@ -0,0 +1,112 @@
+"""
+Extracted Aadhaar records in SQLite (WAL mode), safe for concurrent workers.
+
+    python store.py import aadhaar_data.csv   # one-time import of the legacy CSV
+    python store.py export out.csv            # dump every record as CSV
+"""
+import csv
+import logging
+import os
+import sys
+from db import LocalConnection, connect
+
+log = logging.getLogger(__name__)
+
+RESULTS_DB = os.getenv("RESULTS_DB", "aadhaar_data.db")
+COLUMNS = [
+    "timestamp", "phone_number", "name", "dob", "gender",
+    "aadhaar_number", "address", "pincode"
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    phone_number TEXT,
+    name TEXT,
+    dob TEXT,
+    gender TEXT,
+    aadhaar_number TEXT,
+    address TEXT,
+    pincode TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_records_phone ON records (phone_number);
+CREATE INDEX IF NOT EXISTS idx_records_aadhaar ON records (aadhaar_number);
+CREATE INDEX IF NOT EXISTS idx_records_timestamp ON records (timestamp);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    imported_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+_store = LocalConnection(RESULTS_DB, SCHEMA)
+
+
+def open_store(path=None):
+    conn = connect(path or RESULTS_DB)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_store():
+    # Flask saves PDF results from request threads, so each thread gets its own.
+    return _store.get()
+
+
+def insert_record(result, conn=None):
+    conn = conn or get_store()
+    values = [None if result.get(col) is None else str(result[col]) for col in COLUMNS]
+    cur = conn.execute(
+        f"INSERT INTO records ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+        values
+    )
+    return cur.lastrowid
+
+
+def import_csv(csv_path, conn=None):
+    conn = conn or get_store()
+    source = os.path.abspath(csv_path)
+    if conn.execute("SELECT 1 FROM imports WHERE source = ?", (source,)).fetchone():
+        log.warning(f"⚠️ {csv_path} was already imported, skipping.")
+        return 0
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = [[row.get(col) or None for col in COLUMNS] for row in csv.DictReader(f)]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            f"INSERT INTO records ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            rows
+        )
+        conn.execute("INSERT INTO imports (source, rows) VALUES (?, ?)", (source, len(rows)))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    log.info(f"📥 Imported {len(rows)} records from {csv_path}")
+    return len(rows)
+
+
+def export_csv(out_path, conn=None):
+    conn = conn or get_store()
+    cursor = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM records ORDER BY id")
+    count = 0
+    with open(out_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(COLUMNS)
+        for row in cursor:
+            writer.writerow(row)
+            count += 1
+    log.info(f"📁 Exported {count} records to {out_path}")
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in ("import", "export"):
+        print(__doc__)
+        sys.exit(1)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(message)s")
+    if sys.argv[1] == "import":
+        import_csv(sys.argv[2])
+    else:
+        export_csv(sys.argv[2])
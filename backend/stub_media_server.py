@@ -0,0 +1,58 @@
+"""
+Local stand-in for Twilio's media host, for exercising the media fetcher.
+
+Serves files from a directory over HTTP. Optional basic auth, artificial
+latency and a number of initial 503s per path (to exercise retries).
+
+    python stub_media_server.py ../assets --port 8765 --auth AC123:secret --delay 0.5 --fail 1
+
+Then POST to /whatsapp with MediaUrl0=http://localhost:8765/front.jpg.
+"""
+import argparse
+import base64
+import os
+import time
+from collections import Counter
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+
+
+class StubMediaHandler(SimpleHTTPRequestHandler):
+    auth = None
+    delay = 0.0
+    fail_first = 0
+    failures = Counter()
+
+    def do_GET(self):
+        if self.auth:
+            expected = "Basic " + base64.b64encode(self.auth.encode()).decode()
+            if self.headers.get("Authorization") != expected:
+                self.send_response(401)
+                self.send_header("WWW-Authenticate", 'Basic realm="stub"')
+                self.end_headers()
+                return
+        if self.failures[self.path] < self.fail_first:
+            self.failures[self.path] += 1
+            self.send_error(503, "Injected failure")
+            return
+        if self.delay:
+            time.sleep(self.delay)
+        super().do_GET()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--auth", help="user:password required as basic auth")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each response")
+    parser.add_argument("--fail", type=int, default=0, help="503s to return per path before serving it")
+    args = parser.parse_args()
+
+    StubMediaHandler.auth = args.auth
+    StubMediaHandler.delay = args.delay
+    StubMediaHandler.fail_first = args.fail
+    handler = partial(StubMediaHandler, directory=os.path.abspath(args.directory))
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    print(f"🧪 Serving {args.directory} on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,93 @@
+import os
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer
+import pytest
+import requests
+import media
+from media import MediaTooLarge, download_media, fetch_all
+from stub_media_server import StubMediaHandler
+
+CONTENT = b"\xff\xd8 not really a jpeg " * 64
+AUTH = ("AC123", "secret")
+
+
+class QuietHandler(StubMediaHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    (tmp_path / "front.jpg").write_bytes(CONTENT)
+    # Handler settings are class attributes; every test starts from the defaults.
+    monkeypatch.setattr(StubMediaHandler, "auth", None)
+    monkeypatch.setattr(StubMediaHandler, "delay", 0.0)
+    monkeypatch.setattr(StubMediaHandler, "fail_first", 0)
+    StubMediaHandler.failures.clear()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(tmp_path)))
+    # Clients that give up mid-response (size cap, timeout) leave the handler a broken pipe.
+    httpd.handle_error = lambda request, client_address: None
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def fresh_session(monkeypatch, retries):
+    # get_session() caches one session per process; build one with fewer retries to keep tests fast.
+    monkeypatch.setattr(media, "_session", None)
+    monkeypatch.setattr(media, "MEDIA_RETRIES", retries)
+
+
+def fetch_one(url, tmp_path, auth=None):
+    path = str(tmp_path / "out" / "image_1.jpg")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    [item] = fetch_all([(url, path)], auth)
+    if item is not None:
+        media.wait_for_archive(path, timeout=5)
+    return item, path
+
+
+def test_basic_auth(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(StubMediaHandler, "auth", ":".join(AUTH))
+    item, path = fetch_one(server + "/front.jpg", tmp_path, AUTH)
+    assert item.read() == CONTENT
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+
+    item, _ = fetch_one(server + "/front.jpg", tmp_path, ("AC123", "wrong"))
+    assert item is None
+
+
+def test_retries_after_503(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(StubMediaHandler, "fail_first", 2)
+    item, _ = fetch_one(server + "/front.jpg", tmp_path)
+    assert item.read() == CONTENT
+    assert StubMediaHandler.failures["/front.jpg"] == 2
+
+
+def test_gives_up_after_retries(server, tmp_path, monkeypatch):
+    fresh_session(monkeypatch, retries=1)
+    monkeypatch.setattr(StubMediaHandler, "fail_first", 2)
+    item, _ = fetch_one(server + "/front.jpg", tmp_path)
+    assert item is None
+    assert StubMediaHandler.failures["/front.jpg"] == 2
+
+
+def test_too_large(server, tmp_path):
+    with pytest.raises(MediaTooLarge):
+        download_media(server + "/front.jpg", max_bytes=len(CONTENT) - 1)
+    item, _ = fetch_one(server + "/front.jpg", tmp_path)
+    assert item is not None
+
+
+def test_timeout(server, tmp_path, monkeypatch):
+    fresh_session(monkeypatch, retries=0)
+    monkeypatch.setattr(StubMediaHandler, "delay", 0.5)
+    monkeypatch.setattr(media, "MEDIA_READ_TIMEOUT", 0.1)
+    with pytest.raises(requests.RequestException):
+        download_media(server + "/front.jpg")
+    item, _ = fetch_one(server + "/front.jpg", tmp_path)
+    assert item is None
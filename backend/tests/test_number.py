@@ -0,0 +1,68 @@
+from final import (
+    MAX_NUMBER_CANDIDATES, extract_aadhaar_number, format_number, number_candidates,
+    plausible_number, read_number, resolve_number, verhoeff_check_digit, verhoeff_valid
+)
+
+NUMBER = "234567890124"  # 23456789012 plus its Verhoeff check digit
+
+
+def substitute(digits, position, digit):
+    return digits[:position] + digit + digits[position + 1:]
+
+
+def test_verhoeff_vectors():
+    assert verhoeff_check_digit("236") == "3"
+    assert verhoeff_valid("2363")
+    assert not verhoeff_valid("2364")
+    assert verhoeff_check_digit(NUMBER[:11]) == NUMBER[-1]
+    assert plausible_number(NUMBER)
+    # Every single-digit error is caught.
+    assert not any(
+        verhoeff_valid(substitute(NUMBER, i, d)) for i in range(12) for d in "0123456789" if d != NUMBER[i]
+    )
+
+
+def test_leading_zero_or_one_is_implausible():
+    for first in "01":
+        digits = first + NUMBER[1:11]
+        assert not plausible_number(digits + verhoeff_check_digit(digits))
+
+
+def test_confusable_glyphs_map_to_digits():
+    assert number_candidates("2O12 3B45 6789") == ["201238456789"]
+    assert read_number("Aadhaar No: 2O12 3B45 6789") == "2012 3845 6789"
+
+
+def test_words_of_lookalike_letters_are_not_digits():
+    assert number_candidates("Bill is 2345 6789 0124") == [NUMBER]
+    assert number_candidates("Sol lIB Oil SoIl BOIS") == []
+
+
+def test_vid_run_is_rejected():
+    # A 16-digit VID whose first 12 digits pass the checksum on their own.
+    vid = format_number(NUMBER) + " 5678"
+    assert number_candidates(vid) == []
+    assert number_candidates("VID: 9123 4567 8901 2345") == []
+    assert extract_aadhaar_number(f"VID : {vid}") is None
+
+
+def test_runs_stop_at_line_breaks():
+    assert number_candidates("2345 6789\n0124") == []
+    text = f"{format_number(NUMBER)}\nVID : 9123 4567 8901 2345"
+    assert number_candidates(text) == [NUMBER]
+    assert extract_aadhaar_number(text) == format_number(NUMBER)
+
+
+def test_disagreeing_readings_resolve_to_the_valid_number():
+    readings = [substitute(NUMBER, 3, "9"), substitute(NUMBER, 7, "1")]
+    assert not any(verhoeff_valid(r) for r in readings)
+    assert resolve_number(readings) == format_number(NUMBER)
+
+
+def test_lattice_is_capped():
+    # Five disagreeing positions give 2 ** 5 combinations, the right number among them.
+    positions = (1, 3, 5, 7, 9)
+    assert 2 ** len(positions) > MAX_NUMBER_CANDIDATES
+    readings = [substitute(NUMBER, i, "0" if NUMBER[i] != "0" else "1") for i in positions]
+    assert resolve_number(readings) is None
+    assert resolve_number(readings[:2]) == format_number(NUMBER)
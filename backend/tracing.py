@@ -0,0 +1,219 @@
+"""
+Lightweight stage timing and metrics for the OCR pipeline.
+
+Wrap a step in `with stage('ocr', size=image.size):` and its wall time and
+input size go into per-stage histograms, plus every active collector (see
+bench.py). Each process keeps its own registry; OCR workers dump theirs to
+METRICS_DIR so the Flask process can serve the sum on /metrics.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+# ====== CONFIG ======
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (100, 1e3, 1e4, 1e5, 3e5, 1e6, 3e6, 1e7, 3e7)
+
+METRIC_HELP = {
+    'ocr_stage_seconds': "Wall time per pipeline stage call",
+    'ocr_stage_input_size': "Input size per stage call: bytes for decode, characters for parse, pixels otherwise",
+    'ocr_job_seconds': "Wall time per OCR job",
+    'ocr_jobs_completed_total': "OCR jobs finished successfully",
+    'ocr_jobs_failed_total': "OCR job attempts that raised",
+    'ocr_result_cache_hits_total': "Result cache lookups that hit",
+    'ocr_result_cache_misses_total': "Result cache lookups that missed",
+    'ocr_escalations_total': "Front escalation steps run for fields that failed validation",
+    'ocr_fields_unresolved_total': "Front fields no pass could validate",
+}
+
+_collectors = []
+_histograms = {}  # (name, labels) -> Histogram
+_counters = defaultdict(float)  # (name, labels) -> value
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets, counts=None, total=0.0, count=0):
+        self.buckets = tuple(buckets)
+        self.counts = list(counts) if counts else [0] * (len(self.buckets) + 1)
+        self.sum = total
+        self.count = count
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.sum += other.sum
+        self.count += other.count
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observe(name, value, buckets=DURATION_BUCKETS, **labels):
+    key = (name, label_key(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = Histogram(buckets)
+        hist.observe(value)
+
+
+def increment(name, amount=1, **labels):
+    with _lock:
+        _counters[(name, label_key(labels))] += amount
+
+
+@contextmanager
+def stage(name, size=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe('ocr_stage_seconds', elapsed, stage=name)
+        if size is not None:
+            observe('ocr_stage_input_size', size, SIZE_BUCKETS, stage=name)
+        if _collectors:
+            with _lock:
+                for timings in _collectors:
+                    timings[name] += elapsed
+
+
+@contextmanager
+def collect():
+    """
+    Sum stage durations (seconds) recorded while the block runs into a dict.
+    """
+    timings = defaultdict(float)
+    with _lock:
+        _collectors.append(timings)
+    try:
+        yield timings
+    finally:
+        with _lock:
+            _collectors.remove(timings)
+
+
+# ====== SNAPSHOTS ======
+def snapshot():
+    with _lock:
+        return {
+            'histograms': [
+                {'name': name, 'labels': dict(labels), 'buckets': list(h.buckets),
+                 'counts': list(h.counts), 'sum': h.sum, 'count': h.count}
+                for (name, labels), h in _histograms.items()
+            ],
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in _counters.items()
+            ],
+        }
+
+
+def dump(directory=None):
+    # One file per process, replaced atomically so a reader never sees half a snapshot.
+    directory = directory or METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    with open(path + ".part", 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(path + ".part", path)
+
+
+def clear_dumps(directory=None):
+    directory = directory or METRICS_DIR
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            os.remove(os.path.join(directory, name))
+
+
+def merge(snapshots):
+    histograms = {}
+    counters = defaultdict(float)
+    for snap in snapshots:
+        for h in snap['histograms']:
+            key = (h['name'], label_key(h['labels']))
+            hist = Histogram(h['buckets'], h['counts'], h['sum'], h['count'])
+            if key in histograms:
+                histograms[key].merge(hist)
+            else:
+                histograms[key] = hist
+        for c in snap['counters']:
+            counters[(c['name'], label_key(c['labels']))] += c['value']
+    return histograms, counters
+
+
+def gather(directory=None):
+    """
+    This process's metrics plus the latest dump of every other process.
+    """
+    directory = directory or METRICS_DIR
+    snapshots = [snapshot()]
+    own = f"{os.getpid()}.json"
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json") or name == own:
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return merge(snapshots)
+
+
+# ====== PROMETHEUS ======
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render_prometheus(histograms, counters, gauges=()):
+    """
+    Prometheus text exposition. `gauges` is [(name, help, labels dict, value), ...].
+    """
+    lines = []
+    described = set()
+
+    def describe(name, kind, help_text=None):
+        if name not in described:
+            described.add(name)
+            lines.append(f"# HELP {name} {help_text or METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), hist in sorted(histograms.items()):
+        describe(name, "histogram")
+        cumulative = 0
+        for bound, n in zip(list(hist.buckets) + ["+Inf"], hist.counts):
+            cumulative += n
+            le = bound if bound == "+Inf" else format_value(float(bound))
+            lines.append(f"{name}_bucket{format_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labels)} {format_value(hist.sum)}")
+        lines.append(f"{name}_count{format_labels(labels)} {hist.count}")
+    for (name, labels), value in sorted(counters.items()):
+        describe(name, "counter")
+        lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+    for name, help_text, labels, value in gauges:
+        describe(name, "gauge", help_text)
+        lines.append(f"{name}{format_labels(label_key(labels))} {format_value(value)}")
+    return "\n".join(lines) + "\n"
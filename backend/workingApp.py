@@ -7,7 +7,9 @@ import cv2
 from dotenv import load_dotenv
 from PIL import ImageFile
 from twilio.rest import Client
+from assembler import SubmissionAssembler
 from final import extract_front_fields, extract_back_address
+from media import Media
 
 # Allow truncated images to be loaded safely
 ImageFile.LOAD_TRUNCATED_IMAGES = True
@@ -42,6 +44,7 @@ def whatsapp_webhook():
     os.makedirs(user_dir, exist_ok=True)
 
     # Save incoming images
+    saved_paths = []
     for i in range(num_media):
         media_url = request.form.get(f"MediaUrl{i}")
         content_type = request.form.get(f"MediaContentType{i}")
@@ -56,28 +59,21 @@ def whatsapp_webhook():
                 for chunk in response.iter_content(chunk_size=8192):
                     f.write(chunk)
             print(f"✅ Saved {filename} to {save_path}")
+            saved_paths.append(save_path)
         except Exception as e:
             print(f"❌ Failed to save {filename}: {str(e)}")
 
-    # Delay to let second webhook call complete
-    time.sleep(1.0)
-
-    # Check if exactly 2 images are present
-    image_files = sorted(
-        [os.path.join(user_dir, f) for f in os.listdir(user_dir) if f.startswith("image_")],
-        key=os.path.getmtime
-    )
-
-    if len(image_files) != 2:
-        print("⏳ Waiting for 2 images... Found:", len(image_files))
-        return "OK", 200
+    # Process as soon as the second image of the pair has arrived
+    assembler.add(from_number, [Media(path) for path in saved_paths])
+    return "OK", 200
 
-    img1, img2 = image_files
+def process_pair(from_number, media):
+    img1, img2 = media
 
     # Identify front vs back using gender detection
     print("🔍 Determining which image is the front...")
-    fields1 = extract_front_fields(img1)
-    fields2 = extract_front_fields(img2)
+    fields1 = extract_front_fields(img1.read())
+    fields2 = extract_front_fields(img2.read())
 
     if 'gender' in fields1:
         front, back = img1, img2
@@ -87,13 +83,13 @@ def whatsapp_webhook():
         front_fields = fields2
     else:
         print("❌ Could not determine gender in either image.")
-        return "OK", 200
+        return None
 
-    print(f"✅ Identified {os.path.basename(front)} as FRONT")
-    print(f"📦 Extracting address from {os.path.basename(back)}")
+    print(f"✅ Identified {os.path.basename(front.path)} as FRONT")
+    print(f"📦 Extracting address from {os.path.basename(back.path)}")
 
     try:
-        address, pincode = extract_back_address(back)
+        address, pincode = extract_back_address(back.read())
     except Exception as e:
         print(f"❌ Address extraction error: {e}")
         address, pincode = None, None
@@ -105,7 +101,9 @@ def whatsapp_webhook():
     for k, v in front_fields.items():
         print(f"{k}: {v}")
 
-    return "OK", 200
+    return front_fields
+
+assembler = SubmissionAssembler(process_pair, UPLOAD_DIR)
 
 if __name__ == "__main__":
     app.run(debug=True)